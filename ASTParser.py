@@ -1,4 +1,10 @@
 import ast
+import bisect
+import io
+import tokenize
+from collections import Counter
+
+from SiteIndex import SiteIndex, walk_paths
 
 
 class ASTParser:
@@ -23,3 +29,366 @@ class ASTParser:
         if 0 <= line_num < len(lines):
             lines[line_num] = new_content
         return lines
+
+
+class AnalysisContext:
+    """Parse-once view of one source file, shared by every mutator.
+
+    The tree held here is read-only: mutators inspect it for applicability and
+    site collection, and edit through ``editor()``, a copy-on-write view that
+    shares every untouched subtree with this tree.
+    """
+
+    __slots__ = ('_source', '_tree', '_lines', '_line_offsets', '_tokens', '_token_index', '_sites')
+
+    def __init__(self, source: str):
+        self._source = source
+        self._tree = ASTParser.parse_to_tree(source)
+        self._lines = tuple(source.splitlines())
+        offsets = [0]
+        for line in source.splitlines(keepends=True):
+            offsets.append(offsets[-1] + len(line))
+        self._line_offsets = tuple(offsets)
+        self._tokens = None
+        self._token_index = None
+        self._sites = None
+
+    @property
+    def source(self) -> str:
+        return self._source
+
+    @property
+    def tree(self) -> ast.AST:
+        return self._tree
+
+    @property
+    def lines(self) -> tuple:
+        return self._lines
+
+    @property
+    def line_offsets(self) -> tuple:
+        return self._line_offsets
+
+    @property
+    def tokens(self) -> tuple:
+        if self._tokens is None:
+            tokens = []
+            try:
+                for tok in tokenize.generate_tokens(io.StringIO(self._source).readline):
+                    tokens.append(tok)
+            except (tokenize.TokenError, IndentationError, SyntaxError):
+                pass
+            self._tokens = tuple(tokens)
+        return self._tokens
+
+    @property
+    def token_index(self) -> 'TokenIndex':
+        if self._token_index is None:
+            self._token_index = TokenIndex(self.tokens)
+        return self._token_index
+
+    @property
+    def sites(self) -> SiteIndex:
+        return self._sites
+
+    def index_sites(self, mutators, index: SiteIndex = None) -> SiteIndex:
+        """Build (or adopt a persisted) site table for ``mutators`` and keep it on the context."""
+        self._sites = index if index is not None else SiteIndex.build(self, mutators)
+        return self._sites
+
+    def char_col(self, lineno: int, col_offset: int) -> int:
+        # AST columns are UTF-8 byte offsets; the line table is indexed by character.
+        if 0 < lineno <= len(self._lines):
+            line = self._lines[lineno - 1]
+            if not line.isascii():
+                return len(line.encode('utf-8')[:col_offset].decode('utf-8', errors='ignore'))
+        return col_offset
+
+    def span(self, node: ast.AST) -> tuple:
+        lineno = getattr(node, 'lineno', 0)
+        end_lineno = getattr(node, 'end_lineno', lineno) or lineno
+        return (lineno, self.char_col(lineno, getattr(node, 'col_offset', 0)),
+                end_lineno, self.char_col(end_lineno, getattr(node, 'end_col_offset', 0) or 0))
+
+    @property
+    def is_valid(self) -> bool:
+        return self._tree is not None
+
+    def matches(self, code: str) -> bool:
+        return code is self._source or code == self._source
+
+    def editor(self) -> 'TreeEditor':
+        """A new copy-on-write editor over the shared tree; one per mutation chain."""
+        return TreeEditor(self._tree, self)
+
+    def offset(self, lineno: int, col_offset: int) -> int:
+        """Absolute character offset of a (1-based line, character column) position."""
+        return self._line_offsets[lineno - 1] + col_offset
+
+    def line_span(self, line_num: int) -> tuple:
+        """Character range of a 0-based line, excluding its line terminator."""
+        start = self._line_offsets[line_num]
+        return start, start + len(self._lines[line_num])
+
+    def splice(self, patches) -> str:
+        """Apply non-overlapping (start, end, text) replacements to the source."""
+        pieces = []
+        last = 0
+        for start, end, text in sorted(patches, key=lambda p: p[0]):
+            pieces.append(self._source[last:start])
+            pieces.append(text)
+            last = end
+        pieces.append(self._source[last:])
+        return ''.join(pieces)
+
+class TokenIndex:
+    """Bracket pairs, statement colons and string literals of one file, from a single token pass.
+
+    Built from the tokenize stream, so brackets and colons inside strings and
+    comments are ignored and brackets are matched across lines.  Positions are
+    (1-based line, character column) like every other span.
+    """
+
+    BRACKETS = {'(': ')', '[': ']', '{': '}'}
+    # Python 3.12+ splits f-strings into FSTRING_START/MIDDLE/END tokens.
+    STRING_STARTS = {tokenize.STRING, getattr(tokenize, 'FSTRING_START', tokenize.STRING)}
+
+    def __init__(self, tokens):
+        self.bracket_pairs = []   # (open_line, open_col, close_line, close_col)
+        self.colons = []          # colons outside any bracket, in source order
+        self.strings = []         # (start, end, text) of every STRING token
+        stack = []
+        for tok in tokens:
+            if tok.type == tokenize.OP:
+                if tok.string in self.BRACKETS:
+                    stack.append(tok)
+                elif tok.string in self.BRACKETS.values():
+                    if stack and self.BRACKETS[stack[-1].string] == tok.string:
+                        opening = stack.pop()
+                        self.bracket_pairs.append(opening.start + tok.start)
+                elif tok.string == ':' and not stack:
+                    self.colons.append(tok.start)
+            elif tok.type in self.STRING_STARTS:
+                self.strings.append((tok.start, tok.end, tok.string))
+
+    def colon_after(self, lineno: int, col: int):
+        """Position of the first top-level colon at or after (lineno, col), or None."""
+        i = bisect.bisect_left(self.colons, (lineno, col))
+        return self.colons[i] if i < len(self.colons) else None
+
+
+class TreeEditor:
+    """Applies path-addressed edits to a copy-on-write view of a tree and renders the result.
+
+    The tree passed in is never modified: every edit clones only the nodes (and
+    child lists) on the path from the root to the edited node, so untouched
+    subtrees stay shared with the original and with any other editor over it.
+    ``touch`` additionally gives the caller a private copy of the node's subtree.
+
+    With an AnalysisContext the result is rendered by unparsing only the edited
+    nodes and splicing them into the original text at their recorded spans, so
+    everything outside the edit stays byte-identical.  Without one (or when an
+    edit cannot be located) the whole tree is unparsed.
+    """
+
+    # Operator-like expressions may need parentheses when rendered on their own
+    # inside an operator parent, or as the object of a call/attribute/subscript.
+    OPERATOR_NODES = (ast.BinOp, ast.BoolOp, ast.Compare, ast.UnaryOp, ast.IfExp,
+                      ast.Lambda, ast.NamedExpr, ast.Await, ast.Yield, ast.YieldFrom)
+    OPERATOR_PARENTS = (ast.BinOp, ast.BoolOp, ast.Compare, ast.UnaryOp, ast.Await, ast.IfExp)
+    OBJECT_PARENTS = (ast.Attribute, ast.Subscript, ast.Call)
+
+    def __init__(self, tree: ast.AST, context: 'AnalysisContext' = None):
+        self.tree = tree
+        self.context = context
+        self.edited = []
+        self._removed = []
+        # id -> object for every node/list this editor cloned and may modify.
+        self._owned = {}
+
+    def node(self, path: tuple) -> ast.AST:
+        node = self.tree
+        for field, index in path:
+            node = getattr(node, field)
+            if index is not None:
+                node = node[index]
+        return node
+
+    def walk(self):
+        """Walk the current view; yielded nodes may be shared and must be edited through paths."""
+        return walk_paths(self.tree)
+
+    def touch(self, path: tuple) -> ast.AST:
+        """Return a private copy of the node at ``path`` for in-place modification."""
+        parent = self._own_path(path[:-1]) if path else None
+        node = self._private(self.node(path))
+        if parent is not None:
+            self._put(parent, path[-1], node)
+        else:
+            self.tree = node
+        self.edited.append(path)
+        return node
+
+    def replace(self, path: tuple, new_node: ast.AST) -> ast.AST:
+        # The new node may reuse parts of the shared tree, so the location is
+        # copied onto a clone rather than written into a shared node.
+        new_node = self._clone(new_node)
+        ast.copy_location(new_node, self.node(path))
+        self._put(self._own_path(path[:-1]), path[-1], new_node)
+        self.edited.append(path)
+        return new_node
+
+    def seal(self):
+        """Freeze the nodes edited so far: later edits clone them again instead of modifying them.
+
+        Mutation records keep references to edited nodes and render them later.
+        """
+        self._owned = {}
+
+    def remove(self, path: tuple):
+        # Deferred so that sibling paths stay valid until rendering.
+        self._removed.append(path)
+        self.edited.append(path)
+
+    def _clone(self, obj):
+        if isinstance(obj, list):
+            new = list(obj)
+        else:
+            new = obj.__class__.__new__(obj.__class__)
+            new.__dict__.update(obj.__dict__)
+        self._owned[id(new)] = new
+        return new
+
+    def _own(self, obj):
+        return obj if id(obj) in self._owned else self._clone(obj)
+
+    def _own_path(self, path: tuple) -> ast.AST:
+        """Clone the nodes from the root down to ``path`` (unless already owned) and return the last one."""
+        node = self.tree = self._own(self.tree)
+        for step in path:
+            field, index = step
+            child = getattr(node, field)
+            if index is not None:
+                child = child[index]
+            owned = self._own(child)
+            if owned is not child:
+                self._put(node, step, owned)
+            node = owned
+        return node
+
+    def _put(self, parent: ast.AST, step: tuple, value: ast.AST):
+        field, index = step
+        if index is None:
+            setattr(parent, field, value)
+        else:
+            items = getattr(parent, field)
+            if id(items) not in self._owned:
+                items = self._clone(items)
+                setattr(parent, field, items)
+            items[index] = value
+
+    def _private(self, node):
+        if isinstance(node, list):
+            return [self._private(item) for item in node]
+        if not isinstance(node, ast.AST):
+            return node
+        new = self._clone(node)
+        for field, value in ast.iter_fields(node):
+            if isinstance(value, (ast.AST, list)):
+                setattr(new, field, self._private(value))
+        return new
+
+    def render(self) -> str:
+        if self.context is not None:
+            if not self.edited:
+                return self.context.source
+            patches = self._span_patches()
+            if patches is not None:
+                return self.context.splice(patches)
+        return self._render_tree()
+
+    def _render_tree(self) -> str:
+        for path in sorted(self._removed, reverse=True):
+            parent = self._own_path(path[:-1])
+            field, index = path[-1]
+            items = self._own(getattr(parent, field))
+            setattr(parent, field, items)
+            del items[index]
+        self._removed = []
+        return ASTParser.tree_to_code(self.tree)
+
+    def _span_patches(self):
+        context = self.context
+        removed = set(self._removed)
+        removed_per_list = Counter(path[:-1] + (path[-1][0],) for path in removed)
+
+        edited = set(self.edited)
+        spans = []
+        for path in edited:
+            if any(path[:i] in edited for i in range(len(path))):
+                continue  # inside another edit, which is re-rendered as a whole
+            node = self.node(path)
+            if getattr(node, 'lineno', None) is None or getattr(node, 'end_lineno', None) is None:
+                return None
+            if self._in_fstring(path):
+                return None
+            lineno, col, end_lineno, end_col = context.span(node)
+            spans.append((context.offset(lineno, col), context.offset(end_lineno, end_col), path, node))
+
+        patches = []
+        last_end = -1
+        for start, end, path, node in sorted(spans, key=lambda s: (s[0], -s[1])):
+            if start < last_end:
+                if end > last_end:
+                    return None
+                continue  # nested in an edit that is re-rendered anyway
+            if path in removed:
+                siblings = getattr(self.node(path[:-1]), path[-1][0])
+                if removed_per_list[path[:-1] + (path[-1][0],)] >= len(siblings):
+                    patches.append((start, end, 'pass'))
+                else:
+                    patch = self._removal_patch(node, start, end)
+                    if patch is None:
+                        return None
+                    patches.append(patch)
+            else:
+                patches.append((start, end, self._render_node(path, node, start, end)))
+            last_end = end
+        return patches
+
+    def _in_fstring(self, path) -> bool:
+        # ast.unparse may pick the enclosing f-string's own quote for text spliced
+        # into it, which ends the f-string early; those edits are unparsed as a whole.
+        return any(isinstance(self.node(path[:i]), (ast.JoinedStr, ast.FormattedValue))
+                   for i in range(len(path)))
+
+    def _removal_patch(self, node, start, end):
+        # Drop whole lines when the statement is the only thing on them.
+        context = self.context
+        source = context.source
+        line_start = context.line_offsets[node.lineno - 1]
+        line_end = context.line_offsets[node.end_lineno]
+        if source[line_start:start].strip() or source[end:line_end].strip():
+            return None
+        return line_start, line_end, ''
+
+    def _render_node(self, path, node, start, end) -> str:
+        text = ast.unparse(node)
+        if '\n' in text:
+            line_start = self.context.line_offsets[node.lineno - 1]
+            indent = self.context.source[line_start:start]
+            if not indent.strip():
+                text = text.replace('\n', '\n' + indent)
+        if self._needs_parens(path, node):
+            source = self.context.source
+            if not (source[start - 1:start] == '(' and source[end:end + 1] == ')'):
+                text = f"({text})"
+        return text
+
+    def _needs_parens(self, path, node) -> bool:
+        if not path or not isinstance(node, self.OPERATOR_NODES):
+            return False
+        parent = self.node(path[:-1])
+        if isinstance(parent, self.OPERATOR_PARENTS):
+            return True
+        return isinstance(parent, self.OBJECT_PARENTS) and path[-1][0] in ('func', 'value')
@@ -0,0 +1,151 @@
+from typing import Iterable, List, Tuple
+
+from SiteIndex import MutationSite, SiteIndex, source_hash
+
+_PARSER = None
+
+
+def python_parser():
+    """Shared tree-sitter parser for Python; tree_sitter is only imported on first use."""
+    global _PARSER
+    if _PARSER is None:
+        from tree_sitter import Language, Parser
+        import tree_sitter_python as tspython
+        _PARSER = Parser(Language(tspython.language()))
+    return _PARSER
+
+
+def cst_available() -> bool:
+    try:
+        python_parser()
+    except ImportError:
+        return False
+    return True
+
+
+def walk_cst(node):
+    """Pre-order walk over a tree-sitter node and all of its descendants."""
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(reversed(node.children))
+
+
+class CSTContext:
+    """Error-tolerant view of one program for mutating code ``ast.parse`` rejects.
+
+    Holds the source as UTF-8 bytes and its tree-sitter tree, which parses
+    broken code into a tree with ERROR nodes instead of failing.  Every edit is
+    a byte-range replacement: the tree is told about it with ``tree.edit`` and
+    reparsed incrementally, reusing every subtree outside the edit, so a chain
+    of edits costs one incremental reparse per step.
+
+    CST sites are MutationSites whose ``path`` is ``((start_byte, end_byte),)``
+    of the node; their spans are (1-based line, byte column).  Ranges edited so
+    far are tracked in ``edited`` (in current byte offsets) so later steps can
+    keep clear of them.
+    """
+
+    def __init__(self, source: str, parser=None):
+        self.parser = parser or python_parser()
+        self.data = source.encode('utf-8')
+        self.tree = self.parser.parse(self.data)
+        self.edited: List[Tuple[int, int]] = []
+        self._sites = None
+
+    @property
+    def source(self) -> str:
+        return self.data.decode('utf-8')
+
+    @property
+    def root(self):
+        return self.tree.root_node
+
+    @property
+    def has_error(self) -> bool:
+        return self.root.has_error
+
+    def text(self, start: int, end: int) -> str:
+        return self.data[start:end].decode('utf-8', errors='replace')
+
+    def node_text(self, node) -> str:
+        return self.text(node.start_byte, node.end_byte)
+
+    def node_at(self, site: MutationSite):
+        """The innermost node covering a CST site's range (the node it was collected from)."""
+        (start, end), = site.path
+        return self.root.descendant_for_byte_range(start, end)
+
+    def patched_lines(self, patches) -> Tuple[str, str]:
+        """The source lines ``patches`` touch, before and after applying them, for mutation records."""
+        patches = sorted(patches, key=lambda p: p[0])
+        first = self.data.rfind(b'\n', 0, patches[0][0]) + 1
+        last = self.data.find(b'\n', patches[-1][1])
+        last = len(self.data) if last < 0 else last
+        pieces = []
+        position = first
+        for start, end, text in patches:
+            pieces.append(self.text(position, start))
+            pieces.append(text)
+            position = end
+        pieces.append(self.text(position, last))
+        return self.text(first, last), ''.join(pieces)
+
+    def point(self, offset: int) -> Tuple[int, int]:
+        """tree-sitter point (0-based row, byte column) of a byte offset."""
+        row = self.data.count(b'\n', 0, offset)
+        return row, offset - (self.data.rfind(b'\n', 0, offset) + 1)
+
+    @staticmethod
+    def span(node) -> tuple:
+        return (node.start_point[0] + 1, node.start_point[1], node.end_point[0] + 1, node.end_point[1])
+
+    @staticmethod
+    def path(node) -> tuple:
+        return ((node.start_byte, node.end_byte),)
+
+    @property
+    def sites(self) -> SiteIndex:
+        return self._sites
+
+    def index_sites(self, mutators: Iterable) -> SiteIndex:
+        """Sites of the current tree for the mutators with CST support, in one walk."""
+        mutators = [m for m in mutators if m.CST_NODES]
+        states = {type(m).__name__: {} for m in mutators}
+        handlers = {}
+        for mutator in mutators:
+            for node_type in mutator.CST_NODES:
+                handlers.setdefault(node_type, []).append(mutator)
+        for node in walk_cst(self.root):
+            for mutator in handlers.get(node.type, ()):
+                mutator.collect_cst_sites(node, states[type(mutator).__name__], self)
+
+        sites = []
+        for mutator in mutators:
+            name = type(mutator).__name__
+            for mutate_type, path, span, key in states[name].get('sites', []):
+                sites.append(MutationSite(len(sites), name, mutate_type, path, *span, key))
+        self._sites = SiteIndex(source_hash(self.source), sites, states.keys())
+        return self._sites
+
+    def is_free(self, site: MutationSite) -> bool:
+        (start, end), = site.path
+        return not any(start < e and s < end for s, e in self.edited)
+
+    def apply(self, patches: Iterable[Tuple[int, int, str]]):
+        """Apply non-overlapping (start_byte, end_byte, text) replacements and reparse once."""
+        for start, end, text in sorted(patches, key=lambda p: p[0], reverse=True):
+            new = text.encode('utf-8')
+            start_point, old_end_point = self.point(start), self.point(end)
+            self.data = self.data[:start] + new + self.data[end:]
+            new_end = start + len(new)
+            self.tree.edit(start_byte=start, old_end_byte=end, new_end_byte=new_end,
+                           start_point=start_point, old_end_point=old_end_point,
+                           new_end_point=self.point(new_end))
+            delta = new_end - end
+            self.edited = [(s + delta, e + delta) if s >= end else (s, e + delta) if e >= end else (s, e)
+                           for s, e in self.edited]
+            self.edited.append((start, new_end))
+        self.tree = self.parser.parse(self.data, self.tree)
+        self._sites = None
@@ -1,102 +1,259 @@
+import bisect
 import os
 import json
+import multiprocessing
+from collections import OrderedDict
 
 import numpy as np
 import torch
 from torch.utils.data import Dataset
 from tqdm import tqdm
+from tree_sitter import Parser
 
-from Corrector.translation.run import extract_dataflow, parser, logger, InputFeatures
+from Corrector.FeatureCache import FeatureCache
+from Corrector.translation.parser import DFG_python
+from Corrector.translation.run import extract_dataflow, parser, logger, InputFeatures, PY_LANGUAGE
+from MutantStore import MutantStore
 from config import CONFIG
 
 
-def Convert_examples_to_features(examples, tokenizer, stage=None):
-    features = []
-
-    for example_index, example in enumerate(tqdm(examples, total=len(examples))):
-        code_tokens, dfg = extract_dataflow(example['buggy_code'], parser, "python")
+def Convert_examples_to_features(examples, tokenizer, stage=None, cache_dir=None, workers=None):
+    """Convert examples to InputFeatures, reusing CONFIG.FEATURE_CACHE_DIR (or ``cache_dir``) if set.
+
+    The "test" stage (predictions) is never cached: its inputs are rarely seen
+    twice.  Examples that need converting are spread over ``workers`` processes
+    (default CONFIG.FEATURIZE_WORKERS).
+    """
+    cache_dir = cache_dir or CONFIG.FEATURE_CACHE_DIR
+    if cache_dir and stage != "test":
+        cache = FeatureCache(cache_dir, tokenizer)
+        return cache.features(examples, stage, lambda todo: _convert_examples(todo, tokenizer, stage, workers))
+    return _convert_examples(examples, tokenizer, stage, workers)
+
+
+def _convert_examples(examples, tokenizer, stage=None, workers=None):
+    """Convert examples in order, fanning them out over ``workers`` processes for large lists.
+
+    Every worker gets its own copy of the tokenizer and its own tree-sitter
+    parser once, when it starts; results come back in the order of
+    ``examples``, so the features do not depend on the number of workers.
+    Workers are spawned, not forked: train and predict call this after the
+    model is on the GPU and the fast tokenizer has started its thread pool,
+    neither of which survives a fork.  Lists of at most one chunk (e.g. a
+    single prediction) are converted in-process.
+    """
+    workers = workers or CONFIG.FEATURIZE_WORKERS or os.cpu_count() or 1
+    chunksize = CONFIG.FEATURIZE_CHUNK_SIZE
+    tasks = [(example_index, example, stage) for example_index, example in enumerate(examples)]
+    if workers <= 1 or len(tasks) <= chunksize:
+        _init_worker(tokenizer, parser)
+        return [_convert_task(task) for task in tqdm(tasks, total=len(tasks))]
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(workers, initializer=_init_worker, initargs=(tokenizer,)) as pool:
+        return list(tqdm(pool.imap(_convert_task, tasks, chunksize), total=len(tasks)))
+
+
+# Each worker process sets up its tokenizer, parser and token memo once and reuses them for every example it is given.
+_worker_tokenizer = None
+_worker_parser = None
+_worker_memo = None
+
+
+def _init_worker(tokenizer, dataflow_parser=None):
+    global _worker_tokenizer, _worker_parser, _worker_memo
+    _worker_tokenizer = tokenizer
+    _worker_parser = dataflow_parser or [Parser(PY_LANGUAGE), DFG_python]
+    _worker_memo = TokenMemo(tokenizer) if CONFIG.SUBWORD_CACHE_SIZE else None
+
+
+def _convert_task(task):
+    example_index, example, stage = task
+    return convert_example(example_index, example, _worker_tokenizer, _worker_parser, stage, _worker_memo)
+
+
+def subword_tokens(code_tokens, tokenizer, memo=None):
+    """Subwords of the code tokens, and ``ori2cur_pos``: each code token's (start, end) among them."""
+    if memo is not None:
+        code_tokens = [memo.subwords(x, idx == 0) for idx, x in enumerate(code_tokens)]
+    else:
         code_tokens = [tokenizer.tokenize('@ ' + x )[1:] if idx != 0 else tokenizer.tokenize(x) for idx, x in
                        enumerate(code_tokens)]
-        ori2cur_pos = {}
-        ori2cur_pos[-1] = (0, 0)
-        for i in range(len(code_tokens)):
-            ori2cur_pos[i] = (ori2cur_pos[i - 1][1], ori2cur_pos[i - 1][1] + len(code_tokens[i]))
-        code_tokens = [y for x in code_tokens for y in x]
-
-        # truncating
-        code_tokens = code_tokens[:CONFIG.MAX_SOURCE_LENGTH - 3][:512 - 3]
-
-        source_tokens = [tokenizer.cls_token] + code_tokens + [tokenizer.sep_token]
-        source_ids = tokenizer.convert_tokens_to_ids(source_tokens)
-        position_idx = [i + tokenizer.pad_token_id + 1 for i in range(len(source_tokens))]
-        dfg = dfg[:CONFIG.MAX_SOURCE_LENGTH - len(source_tokens)]
-        source_tokens += [x[0] for x in dfg]
-        position_idx += [0 for x in dfg]
-        source_ids += [tokenizer.unk_token_id for x in dfg]
-        padding_length = CONFIG.MAX_SOURCE_LENGTH - len(source_ids)
-        position_idx += [tokenizer.pad_token_id] * padding_length
-        source_ids += [tokenizer.pad_token_id] * padding_length
-        source_mask = [1] * (len(source_tokens))
-        source_mask += [0] * padding_length
-
-        # reindex
-        reverse_index = {}
-        for idx, x in enumerate(dfg):
-            reverse_index[x[1]] = idx
-        for idx, x in enumerate(dfg):
-            dfg[idx] = x[:-1] + ([reverse_index[i] for i in x[-1] if i in reverse_index],)
-        dfg_to_dfg = [x[-1] for x in dfg]
-        dfg_to_code = [ori2cur_pos[x[1]] for x in dfg]
-        length = len([tokenizer.cls_token])
-        dfg_to_code = [(x[0] + length, x[1] + length) for x in dfg_to_code]
-
-        # target
-        if stage == "test":
-            target_tokens = tokenizer.tokenize("None")
-        else:
-            target_tokens = tokenizer.tokenize(example['fixed_code'])
-
-            if len(target_tokens)>512:
-                print("tk!", example_index,example)
-
-            target_tokens = target_tokens[:CONFIG.MAX_TARGET_LENGTH - 2]
-        target_tokens = [tokenizer.cls_token] + target_tokens + [tokenizer.sep_token]
-        target_ids = tokenizer.convert_tokens_to_ids(target_tokens)
-        target_mask = [1] * len(target_ids)
-        padding_length = CONFIG.MAX_TARGET_LENGTH - len(target_ids)
-        target_ids += [tokenizer.pad_token_id] * padding_length
-        target_mask += [0] * padding_length
-
-        if example_index < 5:
-            if stage == 'train':
-                logger.info("*** Example ***")
-                logger.info("source_tokens: {}".format([x.replace('\u0120', '_') for x in source_tokens]))
-                logger.info("source_ids: {}".format(' '.join(map(str, source_ids))))
-                logger.info("source_mask: {}".format(' '.join(map(str, source_mask))))
-                logger.info("position_idx: {}".format(position_idx))
-                logger.info("dfg_to_code: {}".format(' '.join(map(str, dfg_to_code))))
-                logger.info("dfg_to_dfg: {}".format(' '.join(map(str, dfg_to_dfg))))
-
-                logger.info("target_tokens: {}".format([x.replace('\u0120', '_') for x in target_tokens]))
-                logger.info("target_ids: {}".format(' '.join(map(str, target_ids))))
-                logger.info("target_mask: {}".format(' '.join(map(str, target_mask))))
-
-        features.append(
-            InputFeatures(
-                example_index,
-                source_ids,
-                position_idx,
-                dfg_to_code,
-                dfg_to_dfg,
-                target_ids,
-                source_mask,
-                target_mask,
-            )
-        )
-    return features
+    ori2cur_pos = {}
+    ori2cur_pos[-1] = (0, 0)
+    for i in range(len(code_tokens)):
+        ori2cur_pos[i] = (ori2cur_pos[i - 1][1], ori2cur_pos[i - 1][1] + len(code_tokens[i]))
+    return [y for x in code_tokens for y in x], ori2cur_pos
+
+
+def subword_tokens_fast(code_tokens, tokenizer):
+    """subword_tokens in one call of a fast (Rust) tokenizer on the space-joined code tokens.
+
+    Each subword goes to the code token its character offset falls in; the
+    space in front of a token belongs to that token, as in ``'@ ' + x``.  A
+    token that is empty or starts or ends with whitespace would be split
+    differently next to its neighbours, so such sequences return None and
+    are left to subword_tokens.
+    """
+    if any(not x or x[0].isspace() or x[-1].isspace() for x in code_tokens):
+        return None
+    starts = []
+    position = -1
+    for x in code_tokens:
+        starts.append(position)
+        position += len(x) + 1
+    encoding = tokenizer(' '.join(code_tokens), add_special_tokens=False, return_offsets_mapping=True)
+    counts = [0] * len(code_tokens)
+    for start, end in encoding['offset_mapping']:
+        counts[bisect.bisect_right(starts, start) - 1] += 1
+    ori2cur_pos = {-1: (0, 0)}
+    position = 0
+    for i, count in enumerate(counts):
+        ori2cur_pos[i] = (position, position + count)
+        position += count
+    return encoding.tokens(), ori2cur_pos
+
+
+def target_features(code, tokenizer, stage=None):
+    """target_tokens, target_ids and target_mask of a fixed program, and whether it is over 512 subwords."""
+    if stage == "test":
+        target_tokens = tokenizer.tokenize("None")
+        overlong = False
+    else:
+        target_tokens = tokenizer.tokenize(code)
+        overlong = len(target_tokens) > 512
+        target_tokens = target_tokens[:CONFIG.MAX_TARGET_LENGTH - 2]
+    target_tokens = [tokenizer.cls_token] + target_tokens + [tokenizer.sep_token]
+    target_ids = tokenizer.convert_tokens_to_ids(target_tokens)
+    target_mask = [1] * len(target_ids)
+    padding_length = CONFIG.MAX_TARGET_LENGTH - len(target_ids)
+    target_ids += [tokenizer.pad_token_id] * padding_length
+    target_mask += [0] * padding_length
+    return target_tokens, target_ids, target_mask, overlong
+
+
+class TokenMemo:
+    """Tokenization results one tokenizer has already produced, for the mutants of one original.
+
+    The mutants of an original share almost all of its code tokens and all of
+    its target, so the subwords of each code token are kept in an LRU table
+    of at most ``maxsize`` entries (default CONFIG.SUBWORD_CACHE_SIZE), and the
+    target features of each original in one of at most ``target_size``
+    entries (default CONFIG.TARGET_CACHE_SIZE).  Training converts a shuffled
+    split, so an original's mutants do not arrive together.
+    """
+
+    def __init__(self, tokenizer, maxsize=None, target_size=None):
+        self.tokenizer = tokenizer
+        self.maxsize = CONFIG.SUBWORD_CACHE_SIZE if maxsize is None else maxsize
+        self.target_size = CONFIG.TARGET_CACHE_SIZE if target_size is None else target_size
+        self._subwords = OrderedDict()
+        self._targets = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def subwords(self, token: str, first: bool = False) -> list:
+        """``tokenizer.tokenize(token)`` for the first code token, else ``tokenize('@ ' + token)[1:]``."""
+        key = (token, first)
+        subwords = self._subwords.get(key)
+        if subwords is not None:
+            self._subwords.move_to_end(key)
+            self.hits += 1
+            return subwords
+        self.misses += 1
+        subwords = self.tokenizer.tokenize(token) if first else self.tokenizer.tokenize('@ ' + token)[1:]
+        self._subwords[key] = subwords
+        if len(self._subwords) > self.maxsize:
+            self._subwords.popitem(last=False)
+        return subwords
+
+    def target(self, code: str, stage=None) -> tuple:
+        """target_features(code, tokenizer, stage)."""
+        key = (code, stage)
+        features = self._targets.get(key)
+        if features is not None:
+            self._targets.move_to_end(key)
+            return features
+        features = target_features(code, self.tokenizer, stage)
+        self._targets[key] = features
+        if len(self._targets) > self.target_size:
+            self._targets.popitem(last=False)
+        return features
+
+
+def convert_example(example_index, example, tokenizer, parser, stage=None, memo=None):
+    code_tokens, dfg = extract_dataflow(example['buggy_code'], parser, "python")
+    subwords = None
+    # Once warm, the memo beats even the fast tokenizer on a mutant family.
+    if memo is None and CONFIG.FAST_TOKENIZE and getattr(tokenizer, 'is_fast', False):
+        subwords = subword_tokens_fast(code_tokens, tokenizer)
+    code_tokens, ori2cur_pos = subwords or subword_tokens(code_tokens, tokenizer, memo)
+
+    # truncating
+    code_tokens = code_tokens[:CONFIG.MAX_SOURCE_LENGTH - 3][:512 - 3]
+
+    source_tokens = [tokenizer.cls_token] + code_tokens + [tokenizer.sep_token]
+    source_ids = tokenizer.convert_tokens_to_ids(source_tokens)
+    position_idx = [i + tokenizer.pad_token_id + 1 for i in range(len(source_tokens))]
+    dfg = dfg[:CONFIG.MAX_SOURCE_LENGTH - len(source_tokens)]
+    source_tokens += [x[0] for x in dfg]
+    position_idx += [0 for x in dfg]
+    source_ids += [tokenizer.unk_token_id for x in dfg]
+    padding_length = CONFIG.MAX_SOURCE_LENGTH - len(source_ids)
+    position_idx += [tokenizer.pad_token_id] * padding_length
+    source_ids += [tokenizer.pad_token_id] * padding_length
+    source_mask = [1] * (len(source_tokens))
+    source_mask += [0] * padding_length
+
+    # reindex
+    reverse_index = {}
+    for idx, x in enumerate(dfg):
+        reverse_index[x[1]] = idx
+    for idx, x in enumerate(dfg):
+        dfg[idx] = x[:-1] + ([reverse_index[i] for i in x[-1] if i in reverse_index],)
+    dfg_to_dfg = [x[-1] for x in dfg]
+    dfg_to_code = [ori2cur_pos[x[1]] for x in dfg]
+    length = len([tokenizer.cls_token])
+    dfg_to_code = [(x[0] + length, x[1] + length) for x in dfg_to_code]
+
+    # target
+    target = "None" if stage == "test" else example['fixed_code']
+    if memo is not None:
+        target_tokens, target_ids, target_mask, overlong = memo.target(target, stage)
+        target_ids, target_mask = list(target_ids), list(target_mask)
+    else:
+        target_tokens, target_ids, target_mask, overlong = target_features(target, tokenizer, stage)
+    if overlong:
+        print("tk!", example_index,example)
+
+    if example_index < 5:
+        if stage == 'train':
+            logger.info("*** Example ***")
+            logger.info("source_tokens: {}".format([x.replace('\u0120', '_') for x in source_tokens]))
+            logger.info("source_ids: {}".format(' '.join(map(str, source_ids))))
+            logger.info("source_mask: {}".format(' '.join(map(str, source_mask))))
+            logger.info("position_idx: {}".format(position_idx))
+            logger.info("dfg_to_code: {}".format(' '.join(map(str, dfg_to_code))))
+            logger.info("dfg_to_dfg: {}".format(' '.join(map(str, dfg_to_dfg))))
+
+            logger.info("target_tokens: {}".format([x.replace('\u0120', '_') for x in target_tokens]))
+            logger.info("target_ids: {}".format(' '.join(map(str, target_ids))))
+            logger.info("target_mask: {}".format(' '.join(map(str, target_mask))))
+
+    return InputFeatures(
+        example_index,
+        source_ids,
+        position_idx,
+        dfg_to_code,
+        dfg_to_dfg,
+        target_ids,
+        source_mask,
+        target_mask,
+    )
 
 
 def ReadData(data_dir):
+    if MutantStore.is_store(data_dir):
+        return ReadPackedData(data_dir)
     data = []
     all_files = os.listdir(data_dir)
     # print(len(all_files))
@@ -122,59 +279,145 @@ def ReadData(data_dir):
                 buggy_code = f.read()
 
             mutated_info = ""
+            weight = 1
             info_file = f"{base_name}_info_{err_idx}.json"
             # print("info_file", info_file)
             info_path = os.path.join(data_dir, info_file)
             if os.path.exists(info_path):
                 with open(info_path, "r", encoding="utf-8") as f:
                     info_json = json.load(f)
-                    mutated_info = "\n".join(
-                        [item["mutated_info"] for item in info_json.get("single_Info", [])]
-                    )
-            sample = {"buggy_code": buggy_code, "fixed_code": fixed_code, "mutated_info": mutated_info, "file_name":err_file}
+                    mutated_info = join_mutated_info(info_json)
+                    weight = info_json.get("weight", 1)
+            sample = {"buggy_code": buggy_code, "fixed_code": fixed_code, "mutated_info": mutated_info, "file_name":err_file,
+                      "weight": weight}
             data.append(sample)
         print(f"Loaded {len(data)} samples from {data_dir}")
     return data
 
 
+def ReadPackedData(data_dir):
+    data = []
+    with MutantStore(data_dir) as store:
+        for base_name in store.originals():
+            fixed_code = store.get_original(base_name)
+            if fixed_code is None:
+                continue
+            for err_idx in store.indices(base_name):
+                record = store.get(base_name, err_idx)
+                sample = {"buggy_code": record["mutated_code"], "fixed_code": fixed_code,
+                          "mutated_info": join_mutated_info(record["mutation_info"]),
+                          "file_name": f"{base_name}_err_{err_idx}.py",
+                          "weight": record["mutation_info"].get("weight", 1)}
+                data.append(sample)
+    print(f"Loaded {len(data)} samples from {data_dir}")
+    return data
+
+
+def join_mutated_info(info_json):
+    return "\n".join([item["mutated_info"] for item in info_json.get("single_Info", [])])
+
+
+def graph_arrays(feature):
+    """The integer arrays the graph-guided attention mask is built from.
+
+    Returns node_index (code tokens, <s> and </s> included), max_length (code
+    tokens and DFG nodes), the positions of <s>/</s> and the (row, column)
+    pairs the DFG adds: each node with every token of its code span, both
+    ways, and each node with the nodes it comes from.  DFG node i sits at
+    position node_index + i; spans reaching past the code tokens and edges
+    past the input are left out.
+    """
+    position_idx = np.asarray(feature.position_idx)
+    node_index = int(np.count_nonzero(position_idx > 1))
+    max_length = int(np.count_nonzero(position_idx != 1))
+    source_ids = np.asarray(feature.source_ids)
+    special = np.flatnonzero((source_ids == 0) | (source_ids == 2))
+
+    spans = np.asarray(feature.dfg_to_code, dtype=np.int64).reshape(-1, 2)
+    inside = (spans[:, 0] < node_index) & (spans[:, 1] < node_index)
+    lengths = np.where(inside, spans[:, 1] - spans[:, 0], 0).clip(0)
+    links = np.empty((int(lengths.sum()), 2), dtype=np.int64)
+    links[:, 0] = np.repeat(np.arange(len(spans)), lengths)
+    links[:, 1] = np.arange(len(links)) + np.repeat(spans[:, 0] - (np.cumsum(lengths) - lengths), lengths)
+
+    targets = [a for nodes in feature.dfg_to_dfg for a in nodes]
+    edges = np.empty((len(targets), 2), dtype=np.int64)
+    edges[:, 0] = np.repeat(np.arange(len(feature.dfg_to_dfg)), [len(nodes) for nodes in feature.dfg_to_dfg])
+    edges[:, 1] = targets
+    edges = edges[edges[:, 1] + node_index < len(position_idx)]
+
+    links[:, 0] += node_index
+    pairs = np.concatenate([links, links[:, ::-1], edges + node_index])
+    return node_index, max_length, special, pairs
+
+
+def graph_attention_mask(node_index, max_length, special, pairs, length=None):
+    """Attention mask of one example: code tokens attend to each other, <s>/</s> to the whole
+    input, DFG nodes to their code span (and back) and to the nodes they come from."""
+    length = length or CONFIG.MAX_SOURCE_LENGTH
+    attn_mask = np.zeros((length, length), dtype=bool)
+    attn_mask[:node_index, :node_index] = True
+    attn_mask[special, :max_length] = True
+    attn_mask[pairs[:, 0], pairs[:, 1]] = True
+    np.fill_diagonal(attn_mask, True)
+    return attn_mask
+
+
+def collate_graph_batch(batch):
+    """DataLoader collate_fn for a CodeCorrectDataset with ``batched_mask``: stacks the tensors and
+    builds the attention masks of the whole batch with torch ops."""
+    source_ids, source_mask, position_idx, target_ids, target_mask, pairs = zip(*batch)
+    source_ids = torch.stack(source_ids)
+    position_idx = torch.stack(position_idx)
+    size, length = source_ids.shape
+    node_index = (position_idx > 1).sum(dim=1).tolist()
+    max_length = (position_idx != 1).sum(dim=1).tolist()
+    special = torch.nonzero((source_ids == 0) | (source_ids == 2)).tolist()
+
+    attn_mask = torch.zeros((size, length, length), dtype=torch.bool)
+    for i, n in enumerate(node_index):
+        attn_mask[i, :n, :n] = True
+    for i, row in special:
+        attn_mask[i, row, :max_length[i]] = True
+
+    examples = torch.repeat_interleave(torch.arange(size), torch.tensor([len(p) for p in pairs]))
+    pairs = torch.cat(pairs)
+    attn_mask[examples, pairs[:, 0], pairs[:, 1]] = True
+    attn_mask.diagonal(dim1=1, dim2=2).fill_(True)
+
+    return (source_ids, torch.stack(source_mask), position_idx, attn_mask,
+            torch.stack(target_ids), torch.stack(target_mask))
+
+
 class CodeCorrectDataset(Dataset):
-    def __init__(self, data):
+    """Model inputs of converted features.
+
+    Each item carries its graph-guided attention mask, built with NumPy from
+    the feature's integer arrays.  With ``batched_mask`` (default
+    CONFIG.BATCHED_ATTN_MASK) items carry only the DFG's (row, column) pairs, and
+    ``collate_fn`` builds the masks of a whole batch at once; pass it to the
+    DataLoader.
+    """
+
+    def __init__(self, data, batched_mask=None):
 
         self.data = data
+        self.batched_mask = CONFIG.BATCHED_ATTN_MASK if batched_mask is None else batched_mask
+        self.collate_fn = collate_graph_batch if self.batched_mask else None
 
     def __len__(self):
         return len(self.data)
 
     def __getitem__(self, item):
-        attn_mask = np.zeros((CONFIG.MAX_SOURCE_LENGTH, CONFIG.MAX_SOURCE_LENGTH), dtype=bool)
-
-        node_index = sum([i > 1 for i in self.data[item].position_idx])
-        max_length = sum([i != 1 for i in self.data[item].position_idx])
-
-        attn_mask[:node_index, :node_index] = True
-
-        for idx, i in enumerate(self.data[item].source_ids):
-            if i in [0, 2]:
-                attn_mask[idx, :max_length] = True
-
-        for idx, (a, b) in enumerate(self.data[item].dfg_to_code):
-            if a < node_index and b < node_index:
-                attn_mask[idx + node_index, a:b] = True
-                attn_mask[a:b, idx + node_index] = True
-
-        for idx, nodes in enumerate(self.data[item].dfg_to_dfg):
-            for a in nodes:
-                if a + node_index < len(self.data[item].position_idx):
-                    attn_mask[idx + node_index, a + node_index] = True
-        np.fill_diagonal(attn_mask, True)
-
-        row_sums = attn_mask.sum(axis=1)
-        if (row_sums == 0).any():
-            print(f"警告：样本 {item} 的 attn_mask 存在全零行！")
-
-        return (torch.tensor(self.data[item].source_ids),
-                torch.tensor(self.data[item].source_mask),
-                torch.tensor(self.data[item].position_idx),
-                torch.tensor(attn_mask),
-                torch.tensor(self.data[item].target_ids),
-                torch.tensor(self.data[item].target_mask),)
+        feature = self.data[item]
+        node_index, max_length, special, pairs = graph_arrays(feature)
+        tensors = (torch.as_tensor(feature.source_ids),
+                   torch.as_tensor(feature.source_mask),
+                   torch.as_tensor(feature.position_idx),
+                   torch.as_tensor(feature.target_ids),
+                   torch.as_tensor(feature.target_mask))
+        if self.batched_mask:
+            return tensors + (torch.from_numpy(pairs),)
+
+        attn_mask = graph_attention_mask(node_index, max_length, special, pairs, len(feature.position_idx))
+        return tensors[:3] + (torch.from_numpy(attn_mask),) + tensors[3:]
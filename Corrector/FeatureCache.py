@@ -0,0 +1,197 @@
+import hashlib
+import json
+import os
+import shutil
+import uuid
+from collections.abc import Sequence
+
+import numpy as np
+
+from Corrector.translation.run import InputFeatures
+from config import CONFIG
+
+
+class _Shard:
+    """One batch of cached features: a directory of .npy arrays, memory-mapped on first use."""
+
+    FIELDS = ('keys', 'source_ids', 'position_idx', 'source_mask', 'target_ids', 'target_mask',
+              'dfg_offsets', 'dfg_to_code', 'edge_offsets', 'dfg_edges')
+
+    def __init__(self, path):
+        self.path = path
+        self._arrays = None
+
+    @property
+    def arrays(self) -> dict:
+        if self._arrays is None:
+            self._arrays = {field: np.load(os.path.join(self.path, field + '.npy'), mmap_mode='r')
+                            for field in self.FIELDS}
+        return self._arrays
+
+    def __getstate__(self):
+        # DataLoader workers reopen the maps instead of receiving copies of them.
+        return {'path': self.path, '_arrays': None}
+
+    def feature(self, example_id: int, row: int) -> InputFeatures:
+        a = self.arrays
+        start, end = int(a['dfg_offsets'][row]), int(a['dfg_offsets'][row + 1])
+        edge_offsets = a['edge_offsets'][start:end + 1].tolist()
+        edges = a['dfg_edges'][edge_offsets[0]:edge_offsets[-1]].tolist()
+        base = edge_offsets[0]
+        return InputFeatures(
+            example_id,
+            a['source_ids'][row].astype(np.int64),
+            a['position_idx'][row].astype(np.int64),
+            [tuple(pair) for pair in a['dfg_to_code'][start:end].tolist()],
+            [edges[lo - base:hi - base] for lo, hi in zip(edge_offsets, edge_offsets[1:])],
+            a['target_ids'][row].astype(np.int64),
+            a['source_mask'][row].astype(np.int64),
+            a['target_mask'][row].astype(np.int64),
+        )
+
+    @staticmethod
+    def merge(path: str, shards: list):
+        """Write the rows of ``shards``, in order, as one shard at ``path``."""
+        arrays = {field: np.concatenate([s.arrays[field] for s in shards])
+                  for field in ('keys', 'source_ids', 'position_idx', 'source_mask', 'target_ids', 'target_mask',
+                                'dfg_to_code', 'dfg_edges')}
+        # The offset arrays index into the concatenated node and edge arrays.
+        for field, base_field in (('dfg_offsets', 'dfg_to_code'), ('edge_offsets', 'dfg_edges')):
+            parts, base = [], 0
+            for s in shards:
+                parts.append(s.arrays[field][:-1] + base)
+                base += len(s.arrays[base_field])
+            arrays[field] = np.concatenate(parts + [np.array([base], dtype=np.int64)])
+        _Shard._save(path, arrays)
+
+    @staticmethod
+    def write(path: str, keys: list, features: list):
+        dfg_offsets = np.cumsum([0] + [len(f.dfg_to_code) for f in features], dtype=np.int64)
+        node_edges = [nodes for f in features for nodes in f.dfg_to_dfg]
+        arrays = {
+            'keys': np.array(keys, dtype='S40'),
+            'source_ids': np.array([f.source_ids for f in features], dtype=np.int32),
+            'position_idx': np.array([f.position_idx for f in features], dtype=np.int32),
+            'source_mask': np.array([f.source_mask for f in features], dtype=np.int8),
+            'target_ids': np.array([f.target_ids for f in features], dtype=np.int32),
+            'target_mask': np.array([f.target_mask for f in features], dtype=np.int8),
+            'dfg_offsets': dfg_offsets,
+            'dfg_to_code': np.array([pair for f in features for pair in f.dfg_to_code],
+                                    dtype=np.int32).reshape(-1, 2),
+            'edge_offsets': np.cumsum([0] + [len(nodes) for nodes in node_edges], dtype=np.int64),
+            'dfg_edges': np.array([a for nodes in node_edges for a in nodes], dtype=np.int32),
+        }
+        _Shard._save(path, arrays)
+
+    @staticmethod
+    def _save(path: str, arrays: dict):
+        # Concurrent writers stage into their own directory; a shard is named after
+        # its keys, so one that is already in place holds the same rows.
+        tmp = '{}.{}.tmp'.format(path, uuid.uuid4().hex)
+        os.makedirs(tmp)
+        for field, array in arrays.items():
+            np.save(os.path.join(tmp, field + '.npy'), array)
+        try:
+            os.replace(tmp, path)
+        except OSError:
+            if not os.path.isdir(path):
+                raise
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+class CachedFeatures(Sequence):
+    """Features of a list of examples, read from the cache's memory-mapped shards on access."""
+
+    def __init__(self, locations: list):
+        self.locations = locations
+
+    def __len__(self):
+        return len(self.locations)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        shard, row = self.locations[index]
+        return shard.feature(index, row)
+
+
+class FeatureCache:
+    """On-disk cache for Convert_examples_to_features.
+
+    Features are keyed by the example's buggy code and target, under a directory
+    named after the tokenizer (class, name, vocabulary) and MAX_SOURCE_LENGTH /
+    MAX_TARGET_LENGTH, so a change to any of them starts a fresh cache.  Every
+    call that meets uncached examples converts only those and appends them as a
+    new shard, named after the hash of its keys so that processes sharing the
+    cache never overwrite each other's shards; the id, position and mask arrays
+    and the DFG edge lists are stored as memory-mapped NumPy arrays.  A cache
+    opened with more than ``max_shards`` (default CONFIG.FEATURE_CACHE_MAX_SHARDS)
+    shards merges them into one first, so it opens a bounded number of shards
+    however many calls filled it.
+    """
+
+    VERSION = 1
+    SHARD_PATTERN = 'shard-{}'
+
+    def __init__(self, root: str, tokenizer, max_shards: int = None):
+        self.path = os.path.join(root, self.identity(tokenizer))
+        self.max_shards = CONFIG.FEATURE_CACHE_MAX_SHARDS if max_shards is None else max_shards
+        self.rows = {}
+        self.shards = []
+        if os.path.isdir(self.path):
+            for name in sorted(os.listdir(self.path)):
+                if name.startswith('shard-') and not name.endswith('.tmp'):
+                    try:
+                        self._add_shard(os.path.join(self.path, name))
+                    except FileNotFoundError:
+                        pass  # merged away by another process since the listing
+            # Merged only here, before this process hands out features that point into the shards.
+            if len(self.shards) > self.max_shards:
+                self._compact()
+
+    @staticmethod
+    def identity(tokenizer) -> str:
+        vocab = sorted(tokenizer.get_vocab().items())
+        settings = [FeatureCache.VERSION, type(tokenizer).__name__, getattr(tokenizer, 'name_or_path', ''),
+                    hashlib.sha1(json.dumps(vocab).encode('utf-8')).hexdigest(),
+                    CONFIG.MAX_SOURCE_LENGTH, CONFIG.MAX_TARGET_LENGTH]
+        return hashlib.sha1(json.dumps(settings).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def example_key(example, stage=None) -> str:
+        target = "None" if stage == "test" else example['fixed_code']
+        return hashlib.sha1(json.dumps([example['buggy_code'], target]).encode('utf-8')).hexdigest()
+
+    def features(self, examples, stage, convert) -> CachedFeatures:
+        """Features of ``examples``; ``convert(examples)`` converts the uncached ones."""
+        keys = [self.example_key(example, stage) for example in examples]
+        missing = {}
+        for i, key in enumerate(keys):
+            if key not in self.rows and key not in missing:
+                missing[key] = i
+        if missing:
+            converted = convert([examples[i] for i in missing.values()])
+            name = hashlib.sha1(''.join(missing).encode('ascii')).hexdigest()
+            path = os.path.join(self.path, self.SHARD_PATTERN.format(name))
+            _Shard.write(path, list(missing), converted)
+            self._add_shard(path)
+        return CachedFeatures([self.rows[key] for key in keys])
+
+    def _compact(self):
+        """Merge every shard into one and delete the merged ones."""
+        old = self.shards
+        keys = b''.join(key for shard in old for key in shard.arrays['keys'].tolist())
+        path = os.path.join(self.path, self.SHARD_PATTERN.format(hashlib.sha1(keys).hexdigest()))
+        _Shard.merge(path, old)
+        self.shards = []
+        self.rows = {}
+        self._add_shard(path)
+        for shard in old:
+            if shard.path != path:
+                shutil.rmtree(shard.path, ignore_errors=True)
+
+    def _add_shard(self, path: str):
+        shard = _Shard(path)
+        self.shards.append(shard)
+        for row, key in enumerate(shard.arrays['keys'].tolist()):
+            self.rows[key.decode('ascii')] = (shard, row)
@@ -6,7 +6,7 @@ import logging
 import numpy as np
 import torch
 from torch.optim import AdamW
-from torch.utils.data import random_split, RandomSampler, DataLoader, SequentialSampler
+from torch.utils.data import random_split, RandomSampler, DataLoader, SequentialSampler, WeightedRandomSampler
 from tqdm import tqdm
 from transformers import AutoTokenizer, AutoModelForMaskedLM, AutoModel, EncoderDecoderModel, AutoConfig, \
     AutoModelForCausalLM, GPT2LMHeadModel, AutoModelForSeq2SeqLM, TrainingArguments, Trainer, \
@@ -43,11 +43,18 @@ def train(do_eval=False):
     eval_sample = [data[i] for i in eval_data.indices]
     feature_with_data = Convert_examples_to_features(train_data, tokenizer, "train")
     train_dataset = CodeCorrectDataset(feature_with_data)
+    # A deduplicated mutant stands for `weight` identical draws; sample it that much more often.
+    weights = [data[i].get('weight', 1) for i in train_data.indices]
+    if any(weight != 1 for weight in weights):
+        train_sampler = WeightedRandomSampler(weights, num_samples=len(weights))
+    else:
+        train_sampler = RandomSampler(train_dataset)
     train_loader = DataLoader(
         train_dataset,
         batch_size=CONFIG.BATCH_SIZE // CONFIG.GRADIENT_ACCUMULATION_STEPS,
-        sampler=RandomSampler(train_dataset),
-        num_workers=4
+        sampler=train_sampler,
+        num_workers=4,
+        collate_fn=train_dataset.collate_fn
     )
     # train_parameter
     no_decay = ['bias', 'LayerNorm.weight']
@@ -114,7 +121,7 @@ def train(do_eval=False):
 
             eval_sampler = SequentialSampler(eval_data_set)
             eval_dataloader = DataLoader(eval_data_set, sampler=eval_sampler, batch_size=CONFIG.BATCH_SIZE,
-                                         num_workers=4)
+                                         num_workers=4, collate_fn=eval_data_set.collate_fn)
             # Start Evaling model
             model.eval()
             eval_loss, tokens_num = 0, 0
@@ -167,7 +174,7 @@ def train(do_eval=False):
 
             eval_sampler = SequentialSampler(eval_data_set)
             eval_dataloader = DataLoader(eval_data_set, sampler=eval_sampler, batch_size=CONFIG.BATCH_SIZE,
-                                         num_workers=4)
+                                         num_workers=4, collate_fn=eval_data_set.collate_fn)
             model.eval()
             p = []
             for batch in eval_dataloader:
@@ -239,6 +246,7 @@ def predict(model, features, tokenizer, device):
         dataset,
         batch_size=1,
         sampler=SequentialSampler(dataset),
+        collate_fn=dataset.collate_fn,
     )
     print(device)
     model.to(device)
@@ -279,7 +287,7 @@ def BLEUEvaluate(model, tokenizer, device, data_path):
 
     eval_sampler = SequentialSampler(eval_data_set)
     eval_dataloader = DataLoader(eval_data_set, sampler=eval_sampler, batch_size=CONFIG.BATCH_SIZE,
-                                 num_workers=4)
+                                 num_workers=4, collate_fn=eval_data_set.collate_fn)
     model.eval()
     p = []
     for batch in eval_dataloader:
@@ -1,6 +1,7 @@
 import os
 import xml.etree.ElementTree as ET
 import subprocess
+import tempfile
 import ast
 
 
@@ -36,11 +37,49 @@ def get_test_data(rule_file):
 
 
 def run_test_data(py_file, test_data):
+    return run_tests(['python', py_file], py_file, test_data)
+
+
+def run_test_code(code, name, test_data):
+    """Judge source held in memory, e.g. a mutant read from a MutantStore.
+
+    The code is run from a temporary file, as run_test_data runs files, so
+    tracebacks, __file__ and sys.argv look the same for stored and loose mutants.
+    """
+    with tempfile.NamedTemporaryFile('w', suffix='.py', encoding='utf-8', delete=False) as f:
+        f.write(code)
+    try:
+        return run_tests(['python', f.name], name, test_data)
+    finally:
+        os.remove(f.name)
+
+
+def run_store_tests(store_dir, test_data):
+    """Judge every original and mutant of a packed store, addressed as (original, index).
+
+    Originals are scored under MutantStore.ORIGINAL_INDEX, like the original
+    files of a folder are scored alongside their mutants.
+    """
+    from MutantStore import MutantStore
+    scores = {}
+    with MutantStore(store_dir) as store:
+        for original in store.originals():
+            code = store.get_original(original)
+            if code is not None:
+                scores[(original, MutantStore.ORIGINAL_INDEX)] = run_test_code(code, f"{store_dir}:{original}",
+                                                                              test_data)
+            for index in store.indices(original):
+                name = f"{store_dir}:{original}_err_{index}"
+                scores[(original, index)] = run_test_code(store.get(original, index)['mutated_code'], name, test_data)
+    return scores
+
+
+def run_tests(command, py_file, test_data):
     score = 0
     for input_data, expected_output in test_data:
         try:
             input_str = '\n'.join(map(str, input_data))
-            result = subprocess.run(['python', py_file], input=input_str,
+            result = subprocess.run(command, input=input_str,
                                     capture_output=True, text=True, timeout=5)
             # print("result", result)
             if result.returncode == 0:
@@ -62,18 +101,34 @@ def run_test_data(py_file, test_data):
     return score
 
 
-code_dir = 'code'
-rule_dir = 'rule'
-for folder in os.listdir(code_dir):
-    folder_path = os.path.join(code_dir, folder)
-    if os.path.isdir(folder_path):
-        rule_file = os.path.join(rule_dir, folder + '.xml')
-        if os.path.exists(rule_file):
-            test_data = get_test_data(rule_file)
-            for py_file in os.listdir(folder_path):
-                if py_file.endswith('.py'):
-                    py_file_path = os.path.join(folder_path, py_file)
-                    score = run_test_data(py_file_path, test_data)
-                    print(f"Score for {py_file_path}: {score}")
+def judge_all(code_dir=None, rule_dir=None):
+    """Score every mutant folder under ``code_dir`` against the rule file of the same name."""
+    try:
+        from MutantStore import MutantStore
+    except ImportError:  # run from Judge/ as a script: only folders of .py files
+        MutantStore = None
+    judge_dir = os.path.dirname(os.path.abspath(__file__))
+    code_dir = code_dir or os.path.join(judge_dir, 'code')
+    rule_dir = rule_dir or os.path.join(judge_dir, 'rule')
+    for folder in os.listdir(code_dir):
+        folder_path = os.path.join(code_dir, folder)
+        if os.path.isdir(folder_path):
+            rule_file = os.path.join(rule_dir, folder + '.xml')
+            if os.path.exists(rule_file):
+                test_data = get_test_data(rule_file)
+                if MutantStore is not None and MutantStore.is_store(folder_path):
+                    for (original, index), score in run_store_tests(folder_path, test_data).items():
+                        suffix = "" if index == MutantStore.ORIGINAL_INDEX else f"_err_{index}"
+                        print(f"Score for {folder_path}:{original}{suffix}: {score}")
+                    continue
+                for py_file in os.listdir(folder_path):
+                    if py_file.endswith('.py'):
+                        py_file_path = os.path.join(folder_path, py_file)
+                        score = run_test_data(py_file_path, test_data)
+                        print(f"Score for {py_file_path}: {score}")
 
 
+if __name__ == '__main__':
+    # Packed stores are judged only when run from the repository root (python -m Judge.Judge),
+    # where MutantStore is importable.
+    judge_all()
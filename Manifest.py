@@ -0,0 +1,71 @@
+import hashlib
+import json
+import os
+from typing import Dict, Optional
+
+from config import CONFIG
+from mutators import registry
+
+
+def config_hash() -> str:
+    """Hash of every setting that changes what is generated for a given original."""
+    settings = [CONFIG.MUTATION_SIZE, CONFIG.MUTATION_RATE, CONFIG.MUTATION_TIMES_RATE, CONFIG.DEDUPE_MUTANTS,
+                CONFIG.SAMPLER_RETRY_BUDGET, CONFIG.MAX_TEXT_MUTATORS, CONFIG.CST_BACKEND, CONFIG.TCE_FILTER,
+                CONFIG.SAMPLER_RATE_CORRECTION, [(name, registry.rate(name)) for name in registry.names()]]
+    return hashlib.sha1(json.dumps(settings).encode('utf-8')).hexdigest()
+
+
+class Manifest:
+    """Append-only record of which originals a generation run has finished.
+
+    Each line of ``manifest.jsonl`` describes one original once all of its outputs
+    are written: its source hash, the configuration hash, the output format and
+    the outputs themselves.  A later line for the same original supersedes
+    earlier ones.  An original is invalidated before its outputs are rewritten,
+    so an interrupted run only redoes the original it was on.
+    """
+
+    FILE_NAME = 'manifest.jsonl'
+
+    def __init__(self, directory: str):
+        self.path = os.path.join(directory, self.FILE_NAME)
+        self.entries: Dict[str, dict] = {}
+        self._torn = False
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        self._torn = True  # last line of an interrupted run
+                        continue
+                    self.entries[entry['original']] = entry
+                    self._torn = not line.endswith('\n')
+
+    def get(self, original: str) -> Optional[dict]:
+        return self.entries.get(original)
+
+    def is_current(self, original: str, code_hash: str, cfg_hash: str, output_format: str) -> bool:
+        entry = self.entries.get(original)
+        return entry is not None and entry['source_hash'] == code_hash \
+            and entry['config_hash'] == cfg_hash and entry['format'] == output_format
+
+    def record(self, original: str, code_hash: str, cfg_hash: str, output_format: str, outputs: list):
+        self._append({'original': original, 'source_hash': code_hash, 'config_hash': cfg_hash,
+                      'format': output_format, 'outputs': outputs})
+
+    def invalidate(self, original: str):
+        """Mark an original as being rewritten, keeping its old outputs listed for cleanup."""
+        entry = self.entries.get(original)
+        if entry is not None and entry['source_hash'] is not None:
+            self._append(dict(entry, source_hash=None, config_hash=None))
+
+    def _append(self, entry: dict):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            if self._torn:
+                f.write('\n')
+                self._torn = False
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self.entries[entry['original']] = entry
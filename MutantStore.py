@@ -0,0 +1,150 @@
+import json
+import os
+from typing import Dict, Iterator, Optional, Tuple
+
+from config import CONFIG
+
+
+class MutantStore:
+    """Packed, append-only storage for generated mutants.
+
+    Records are JSON lines in numbered shards (``mutants-00000.jsonl`` ...); each
+    holds ``original``, ``index``, ``mutated_code`` and ``mutation_info``.  The
+    source of every original is stored once, under ``ORIGINAL_INDEX``.
+    ``index.tsv`` maps (original, index) to (shard, byte offset, length) and is
+    appended only after the record itself is on disk, so a crashed run leaves at
+    most an unindexed tail that is ignored on reading.
+    """
+
+    INDEX_FILE = 'index.tsv'
+    SHARD_PATTERN = 'mutants-{:05d}.jsonl'
+    ORIGINAL_INDEX = -1
+
+    def __init__(self, path: str, shard_size: Optional[int] = None):
+        self.path = path
+        self.shard_size = shard_size or CONFIG.PACK_SHARD_SIZE
+        self.offsets: Dict[Tuple[str, int], Tuple[int, int, int]] = {}
+        self._by_original: Dict[str, set] = {}
+        self._shard = None
+        self._shard_id = 0
+        self._index = None
+        self._readers = {}
+        self._torn = False
+        index_path = os.path.join(path, self.INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    fields = line.rstrip('\n').split('\t')
+                    if not line.endswith('\n') or len(fields) != 5:
+                        self._torn = True  # last line of an interrupted run
+                        continue
+                    original, index, shard, offset, length = fields
+                    self._add_offset((original, int(index)), (int(shard), int(offset), int(length)))
+                    self._shard_id = max(self._shard_id, int(shard))
+
+    @staticmethod
+    def is_store(path: str) -> bool:
+        return os.path.isfile(os.path.join(path, MutantStore.INDEX_FILE))
+
+    def __len__(self):
+        return sum(index != self.ORIGINAL_INDEX for _, index in self.offsets)
+
+    def __contains__(self, key: Tuple[str, int]) -> bool:
+        return key in self.offsets
+
+    def originals(self):
+        return sorted(self._by_original)
+
+    def indices(self, original: str):
+        return sorted(index for index in self._by_original.get(original, ()) if index != self.ORIGINAL_INDEX)
+
+    def add_original(self, original: str, code: str):
+        self._append({'original': original, 'index': self.ORIGINAL_INDEX, 'code': code})
+
+    def add(self, original: str, index: int, mutated_code: str, mutation_info: dict):
+        self._append({'original': original, 'index': index,
+                      'mutated_code': mutated_code, 'mutation_info': mutation_info})
+
+    def discard(self, original: str, index: int):
+        """Drop a record from the index; its bytes stay in the shard."""
+        if (original, index) in self.offsets:
+            self._open_for_append()
+            self._write_index((original, index), (-1, 0, 0))
+
+    def get(self, original: str, index: int) -> dict:
+        shard, offset, length = self.offsets[(original, index)]
+        f = self._readers.get(shard)
+        if f is None:
+            f = self._readers[shard] = open(self._shard_path(shard), 'rb')
+        f.seek(offset)
+        return json.loads(f.read(length).decode('utf-8'))
+
+    def get_original(self, original: str) -> Optional[str]:
+        if (original, self.ORIGINAL_INDEX) not in self.offsets:
+            return None
+        return self.get(original, self.ORIGINAL_INDEX)['code']
+
+    def __iter__(self) -> Iterator[dict]:
+        """Mutant records in (original, index) order."""
+        for original, index in sorted(self.offsets):
+            if index != self.ORIGINAL_INDEX:
+                yield self.get(original, index)
+
+    def close(self):
+        for f in self._readers.values():
+            f.close()
+        self._readers = {}
+        if self._shard is not None:
+            self._shard.close()
+            self._index.close()
+            self._shard = self._index = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _shard_path(self, shard: int) -> str:
+        return os.path.join(self.path, self.SHARD_PATTERN.format(shard))
+
+    def _open_for_append(self):
+        if self._shard is None:
+            os.makedirs(self.path, exist_ok=True)
+            self._shard = open(self._shard_path(self._shard_id), 'ab')
+            self._index = open(os.path.join(self.path, self.INDEX_FILE), 'a', encoding='utf-8')
+            if self._torn:
+                self._index.write('\n')
+                self._torn = False
+
+    def _append(self, record: dict):
+        data = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+        self._open_for_append()
+        offset = self._shard.tell()
+        if offset and offset + len(data) > self.shard_size:
+            self._shard.close()
+            self._shard_id += 1
+            self._shard = open(self._shard_path(self._shard_id), 'ab')
+            offset = self._shard.tell()
+        self._shard.write(data)
+        self._shard.flush()
+
+        self._write_index((record['original'], record['index']), (self._shard_id, offset, len(data) - 1))
+
+    def _write_index(self, key: Tuple[str, int], location: Tuple[int, int, int]):
+        self._index.write('\t'.join(map(str, key + location)) + '\n')
+        self._index.flush()
+        self._add_offset(key, location)
+
+    def _add_offset(self, key: Tuple[str, int], location: Tuple[int, int, int]):
+        # A negative shard marks a discarded record.
+        if location[0] < 0:
+            self.offsets.pop(key, None)
+            indices = self._by_original.get(key[0])
+            if indices is not None:
+                indices.discard(key[1])
+                if not indices:
+                    del self._by_original[key[0]]
+            return
+        self.offsets[key] = location
+        self._by_original.setdefault(key[0], set()).add(key[1])
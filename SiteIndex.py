@@ -0,0 +1,152 @@
+import ast
+import hashlib
+import inspect
+import json
+import os
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Tuple
+
+
+@dataclass(frozen=True)
+class MutationSite:
+    site_id: int
+    mutator: str
+    mutate_type: str
+    path: Tuple
+    lineno: int
+    col_offset: int
+    end_lineno: int
+    end_col_offset: int
+    key: str = ''
+
+    def to_list(self) -> list:
+        return [self.site_id, self.mutator, self.mutate_type, [list(p) for p in self.path],
+                self.lineno, self.col_offset, self.end_lineno, self.end_col_offset, self.key]
+
+    @staticmethod
+    def from_list(row: list) -> 'MutationSite':
+        site_id, mutator, mutate_type, path, lineno, col, end_lineno, end_col, key = row
+        return MutationSite(site_id, mutator, mutate_type, tuple(tuple(p) for p in path),
+                            lineno, col, end_lineno, end_col, key)
+
+
+def source_hash(code: str) -> str:
+    return hashlib.sha1(code.encode('utf-8')).hexdigest()
+
+
+def definitions_hash(mutators: Iterable) -> str:
+    """Hash of the code that defines the mutators' sites: their modules and those of their base classes.
+
+    Persisted tables record it, so a table written before a mutator's site
+    definitions changed is rebuilt instead of reused.
+    """
+    modules = {inspect.getmodule(cls) for m in mutators for cls in type(m).__mro__ if cls is not object}
+    parts = []
+    for module in sorted(modules, key=lambda module: module.__name__):
+        try:
+            parts.append(module.__name__ + '\n' + inspect.getsource(module))
+        except (OSError, TypeError):
+            parts.append(module.__name__)
+    return source_hash('\n'.join(parts))
+
+
+def walk_paths(tree: ast.AST):
+    """Pre-order walk yielding (node, path); a path is a tuple of (field, index) steps."""
+    stack = [(tree, ())]
+    while stack:
+        node, path = stack.pop()
+        yield node, path
+        children = []
+        for field, value in ast.iter_fields(node):
+            if isinstance(value, list):
+                for i, item in enumerate(value):
+                    if isinstance(item, ast.AST):
+                        children.append((item, path + ((field, i),)))
+            elif isinstance(value, ast.AST):
+                children.append((value, path + ((field, None),)))
+        stack.extend(reversed(children))
+
+
+class SiteIndex:
+    """Typed table of every mutation site in one program.
+
+    The table is built by a single walk over the shared AST: each node is routed
+    to the mutators that list its type in ``SITE_NODES``.  Text-level mutators add
+    their sites in ``finish_sites``.  Spans use 1-based lines and character columns.
+    """
+
+    VERSION = 2
+
+    def __init__(self, code_hash: str, sites: List[MutationSite], mutator_names: Iterable[str] = ()):
+        self.code_hash = code_hash
+        self.sites = sites
+        self.mutator_names = set(mutator_names)
+        self.by_mutator: Dict[str, List[MutationSite]] = {}
+        for site in sites:
+            self.by_mutator.setdefault(site.mutator, []).append(site)
+
+    def __len__(self):
+        return len(self.sites)
+
+    def __getitem__(self, site_id: int) -> MutationSite:
+        return self.sites[site_id]
+
+    def covers(self, mutator_name: str) -> bool:
+        return mutator_name in self.mutator_names
+
+    def for_mutator(self, mutator_name: str) -> List[MutationSite]:
+        return self.by_mutator.get(mutator_name, [])
+
+    @staticmethod
+    def build(context, mutators: Iterable) -> 'SiteIndex':
+        mutators = list(mutators)
+        states = {type(m).__name__: {} for m in mutators}
+        handlers = {}
+        for mutator in mutators:
+            for node_type in mutator.SITE_NODES:
+                handlers.setdefault(node_type, []).append(mutator)
+
+        if context.tree is not None and handlers:
+            for node, path in walk_paths(context.tree):
+                for mutator in handlers.get(type(node), ()):
+                    mutator.collect_sites(node, path, states[type(mutator).__name__], context)
+
+        sites = []
+        for mutator in mutators:
+            name = type(mutator).__name__
+            for mutate_type, path, span, key in mutator.finish_sites(states[name], context):
+                sites.append(MutationSite(len(sites), name, mutate_type, path, *span, key))
+        return SiteIndex(source_hash(context.source), sites, states.keys())
+
+    def save(self, path: str, definitions: str = None):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': self.VERSION,
+                'definitions': definitions,
+                'source_hash': self.code_hash,
+                'mutators': sorted(self.mutator_names),
+                'sites': [site.to_list() for site in self.sites]
+            }, f)
+
+    @staticmethod
+    def load(path: str, code: str = None, definitions: str = None):
+        """Load a persisted table; returns None if missing, stale or from another version.
+
+        With ``definitions`` (see definitions_hash), a table saved under other site
+        definitions is stale too.
+        """
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get('version') != SiteIndex.VERSION:
+            return None
+        if definitions is not None and data.get('definitions') != definitions:
+            return None
+        if code is not None and data.get('source_hash') != source_hash(code):
+            return None
+        return SiteIndex(data['source_hash'], [MutationSite.from_list(row) for row in data['sites']],
+                         data.get('mutators', []))
@@ -9,18 +9,38 @@ class CONFIG:
     NO_CUDA = False
     MAX_SOURCE_LENGTH = 512
     MAX_TARGET_LENGTH = 512
+    FEATURE_CACHE_DIR = "data/feature_cache"   # None converts examples anew on every call
+    FEATURE_CACHE_MAX_SHARDS = 8   # merge the cache's shards into one once there are more
+    FEATURIZE_WORKERS = None   # None uses every core
+    FEATURIZE_CHUNK_SIZE = 64
+    SUBWORD_CACHE_SIZE = 100000   # code tokens whose subwords each featurizing process remembers; 0 for none
+    TARGET_CACHE_SIZE = 4096   # originals whose target features each featurizing process remembers
+    FAST_TOKENIZE = True   # without that memo, tokenize each example's code tokens in one call of a fast tokenizer
 
     WEIGHT_DECAY = 0.0
     ADAM_EPSILON = 1e-8
     GRADIENT_ACCUMULATION_STEPS = 1
     MAX_LENGTH = 256
     BATCH_SIZE = 2
+    BATCHED_ATTN_MASK = False   # build attention masks per batch in the DataLoader's collate_fn
     LEARNING_RATE = 1e-5
     EPOCHS = 20
     BEAM_SIZE = 10
 
     INPUT_DIR = 'data/ori_code'
     OUTPUT_DIR = 'data/mutated_code'
+    SITE_INDEX_DIR = 'data/site_index'
+    GENERATION_WORKERS = None   # None uses every core
+    GENERATION_CHUNK_SIZE = 4
+    PACK_OUTPUT = False
+    DEDUPE_MUTANTS = True   # keep repeated mutants once with a weight; training samples them by that weight
+    TCE_FILTER = True   # drop mutants that compile like the original, merge those that compile alike
+    SAMPLER_RETRY_BUDGET = 3   # substitute mutators tried per chain when a step cannot be realized
+    SAMPLER_RATE_CORRECTION = False   # steer each sample's weights by what earlier samples realized; sample k
+                                      # can then only be rebuilt by replaying samples 0..k-1
+    MAX_TEXT_MUTATORS = 2   # text-level (syntax error) mutators per chain; None for no limit
+    CST_BACKEND = True   # mutate originals ast.parse rejects on tree-sitter's CST (if installed)
+    PACK_SHARD_SIZE = 64 * 1024 * 1024
     MUTATION_SIZE = 50
     MUTATION_RATE = [
         0.015,   # bracket
@@ -39,6 +59,8 @@ class CONFIG:
         0.085    # EmptyStructureMutator
         #  total 0.985
     ]
+    PLUGIN_MUTATION_RATE = {}   # rate of each plugin mutator (mutators.registry) by name, on MUTATION_RATE's scale
+    PLUGIN_DEFAULT_RATE = 0.015   # rate of a plugin missing from PLUGIN_MUTATION_RATE
     MUTATION_TIMES_RATE = [
         0.0235,
         0.0350,
@@ -1,103 +1,321 @@
+import ast
 import json
-import random
+import multiprocessing
+import time
+import types
 
+from ASTParser import AnalysisContext
+from CSTParser import CSTContext, cst_available
+from Manifest import Manifest, config_hash
+from MutantStore import MutantStore
+from SiteIndex import SiteIndex, definitions_hash, source_hash
 from config import CONFIG
-from mutators.BracketMutator import BracketMutator
-from mutators.ColonMutator import ColonMutator
-from mutators.FunctionMutator import FunctionMutator
-from mutators.IndentMutator import IndentMutator
-from mutators.ModuleMutator import ModuleMutator
-from mutators.QuoteMutator import QuoteMutator
-from mutators.VariableNameMutator import VariableNameMutator
-from mutators.OperatorMutator import OperatorMutator
-from mutators.ConditionMutator import ConditionMutator
-from mutators.BoundaryMutator import BoundaryMutator
-from mutators.ArrayMutator import ArrayMutator
-from mutators.ArgMutator import ArgMutator
-from mutators.ControlFlowMutator import ControlFlowMutator
-from mutators.EmptyStructureMutator import EmptyStructureMutator
+from mutators.BaseMutator import sample_rng
+from mutators.ChainExecutor import ChainExecutor, render_info
+from mutators.ChainPlanner import ChainPlanner
+from mutators.CSTChainExecutor import CSTChainExecutor
+from mutators.MutantEnumerator import MutantEnumeration
+from mutators.MutationSampler import MutationSampler
+from mutators import registry
 import os
 
 
 class DataPipeline:
     def __init__(self):
-        self.mutators = [
-            BracketMutator(),
-            ColonMutator(),
-            FunctionMutator(),
-            IndentMutator(),
-            ModuleMutator(),
-            OperatorMutator(),
-            QuoteMutator(),
-            VariableNameMutator(),
-            ConditionMutator(),
-            BoundaryMutator(),
-            ArrayMutator(),
-            ArgMutator(),
-            ControlFlowMutator(),
-            EmptyStructureMutator()
-        ]
-
-    def generate_dataset(self, input_dir, output_dir):
-        os.makedirs(output_dir, exist_ok=True)
+        # The built-in mutators in the order of CONFIG.MUTATION_RATE, then the plugins.
+        self.mutators = registry.create()
+        self.site_definitions = definitions_hash(self.mutators)
+        self.executor = ChainExecutor()
+        self.cst_executor = CSTChainExecutor()
 
-        for filename in os.listdir(input_dir):
-            with open(os.path.join(input_dir, filename), 'r', encoding='utf-8') as f:
-                original_code = f.read()
+    def apply_failures(self) -> int:
+        """Mutator applies that raised so far, across both chain executors."""
+        return sum(self.executor.failures.values()) + sum(self.cst_executor.failures.values())
+
+    def load_site_index(self, filename, context, index_dir=None):
+        index_dir = index_dir or CONFIG.SITE_INDEX_DIR
+        index_path = os.path.join(index_dir, f"{filename}.sites.json")
+        index = SiteIndex.load(index_path, context.source, self.site_definitions)
+        if index is not None and all(index.covers(type(m).__name__) for m in self.mutators):
+            return context.index_sites(self.mutators, index)
+        index = context.index_sites(self.mutators)
+        os.makedirs(index_dir, exist_ok=True)
+        index.save(index_path, self.site_definitions)
+        return index
+
+    def generate_samples(self, filename, original_code):
+        """Sample CONFIG.MUTATION_SIZE mutants of one original; the result depends only on its content.
+
+        With CONFIG.DEDUPE_MUTANTS, mutants with the same normalized content are
+        kept once, and ``mutation_info['weight']`` counts how often each was drawn.
+        With CONFIG.TCE_FILTER, mutants that compile to the same code objects as the
+        original are dropped, and those that compile alike count as the same mutant.
+        """
+        original_bytecode = bytecode_hash(original_code) if CONFIG.TCE_FILTER else None
+        samples = {}
+        for i, sample in enumerate(self.iter_samples(filename, original_code)):
+            bytecode = bytecode_hash(sample['mutated_code']) if CONFIG.TCE_FILTER else None
+            if bytecode is not None and bytecode == original_bytecode:
+                continue
+            if not CONFIG.DEDUPE_MUTANTS:
+                key = i
+            elif bytecode is not None:
+                key = ('bytecode', bytecode)
+            else:
+                key = ('source', normalized_hash(sample['mutated_code']))
+            if key in samples:
+                samples[key]['mutation_info']['weight'] += 1
+                continue
+            sample['sample_index'] = i
+            sample['mutation_info']['weight'] = 1
+            render_info(sample['mutation_info']['single_Info'])
+            samples[key] = sample
+        return list(samples.values())
 
-            samples = []
-
-            available_mutators = [m for m in self.mutators if m.can_mutate(original_code)]
-            mutators_with_none = available_mutators + [None]
-            index_list = [self.mutators.index(m) for m in available_mutators]
-            available_rates = [CONFIG.MUTATION_RATE[i] for i in index_list]
-            rates_with_none = available_rates + [1 - sum(CONFIG.MUTATION_RATE)]
-
-            for i in range(CONFIG.MUTATION_SIZE):
-                print("time:", i)
-                time = random.choices(range(min(len(CONFIG.MUTATION_TIMES_RATE), len(index_list))),
-                                      weights=CONFIG.MUTATION_TIMES_RATE[:len(available_mutators)], k=1)[0]
-                mutators = random.choices(mutators_with_none, weights=rates_with_none, k=time)
-                mutated = original_code
-                singleMutationInfo = []
-                count = 0
-                for mutator in mutators:
-                    print("mutator:", type(mutator).__name__)
-                    if mutator is None:
-                        continue
-                    try:
-                        print("ori:", mutated)
-                        mutated = mutator.mutate(mutated)
-                        print("mutated:", mutated)
-                        print("info", mutator.mutation_record)
-                        print("isSuccessful:", mutator.successful)
-                        count += 1
-                        if mutator.successful:
-                            singleMutationInfo.append({
-                                'mutated_info': str(mutator.mutation_record),
-                                'mutator_type': type(mutator).__name__
-                            })
-                            mutator.init()
-                    except Exception as e:
-                        print(e)
-                        break
-                total_Mutation_Info = {
+    def iter_samples(self, filename, original_code, n_samples=None, start=0):
+        """Lazily sample mutants of one original; ``filename`` None skips the persisted site index.
+
+        Yields samples ``start`` to ``n_samples`` - 1, so ``start=k, n_samples=k + 1``
+        rebuilds the sample stored under sample_index k.  Only with
+        CONFIG.SAMPLER_RATE_CORRECTION are the samples before ``start`` run (and
+        discarded) to get there.  The single_Info records are left unrendered; see
+        render_info.
+        """
+        context = AnalysisContext(original_code)
+        if context.tree is None and CONFIG.CST_BACKEND and cst_available():
+            yield from self._iter_cst_samples(original_code, n_samples, start)
+            return
+        if filename is not None:
+            index = self.load_site_index(filename, context)
+        else:
+            index = context.index_sites(self.mutators)
+        available_mutators = [m for m in self.mutators if m.can_mutate(original_code, context)]
+        planner = ChainPlanner(available_mutators, context)
+        sampler = MutationSampler(available_mutators, planner=planner)
+
+        first = 0 if sampler.rate_correction else start
+        for i in range(first, CONFIG.MUTATION_SIZE if n_samples is None else n_samples):
+            time, mutators, ordinals = sampler.draw_chain(sample_rng(index.code_hash, i), i)
+            mutated, singleMutationInfo = self.executor.run(context, mutators, i, ordinals, sampler.retry)
+            sampler.update(singleMutationInfo)
+            if i < start:
+                continue
+            total_Mutation_Info = {
+                'expectedTimes': time,
+                'times': len(singleMutationInfo),
+                'realTimes': self.executor.applied,
+                'single_Info': singleMutationInfo
+            }
+            yield {
+                'mutated_code': mutated,
+                'mutation_info': total_Mutation_Info
+            }
+
+    def _iter_cst_samples(self, original_code, n_samples=None, start=0):
+        """iter_samples for an original that does not parse: the CST-capable mutators on tree-sitter's CST."""
+        index = CSTContext(original_code).index_sites(self.mutators)
+        available_mutators = [m for m in self.mutators if index.for_mutator(type(m).__name__)]
+        sampler = MutationSampler(available_mutators)
+
+        first = 0 if sampler.rate_correction else start
+        for i in range(first, CONFIG.MUTATION_SIZE if n_samples is None else n_samples):
+            time, mutators, _ = sampler.draw_chain(sample_rng(index.code_hash, i), i)
+            mutated, singleMutationInfo = self.cst_executor.run(original_code, mutators, i, retry=sampler.retry)
+            sampler.update(singleMutationInfo)
+            if i < start:
+                continue
+            yield {
+                'mutated_code': mutated,
+                'mutation_info': {
                     'expectedTimes': time,
                     'times': len(singleMutationInfo),
-                    'realTimes': count,
+                    'realTimes': self.cst_executor.applied,
                     'single_Info': singleMutationInfo
                 }
-                samples.append({
-                    'mutated_code': mutated,
-                    'mutation_info': total_Mutation_Info
-                })
+            }
+
+    def iter_mutants(self, sources, n_per_source=None):
+        """Stream (original, mutated_code, mutation_info) records without touching the disk.
+
+        ``sources`` yields original code strings, or (filename, code) pairs to reuse
+        the persisted site index.  Only one original is held in memory at a time,
+        and sample k of an original is the same one generate_dataset writes.
+        """
+        for source in sources:
+            filename, original_code = source if isinstance(source, tuple) else (None, source)
+            for sample in self.iter_samples(filename, original_code, n_per_source):
+                render_info(sample['mutation_info']['single_Info'])
+                yield original_code, sample['mutated_code'], sample['mutation_info']
+
+    def enumerate_mutants(self, code):
+        """Exhaustive first-order mode: every (site, operator, replacement) mutant of ``code``.
+
+        The returned MutantEnumeration has a known ``len()`` and renders lazily;
+        ``iter(start, stop)`` splits or resumes a run.
+        """
+        return MutantEnumeration(code, self.mutators)
+
+    def generate_dataset(self, input_dir, output_dir, workers=None, chunksize=None, packed=None):
+        """Mutate every original in ``input_dir``, sharding the originals over ``workers`` processes.
+
+        Originals are processed in sorted order and written as results arrive in
+        that order, so the output does not depend on the number of workers.
+        With ``packed`` (default CONFIG.PACK_OUTPUT) the originals and mutants go
+        to a MutantStore in ``output_dir`` instead of two files per mutant.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        workers = workers or CONFIG.GENERATION_WORKERS or os.cpu_count() or 1
+        chunksize = chunksize or CONFIG.GENERATION_CHUNK_SIZE
+        packed = CONFIG.PACK_OUTPUT if packed is None else packed
+        output_format = 'packed' if packed else 'files'
+
+        # Only originals whose source or generation settings changed since their
+        # manifest entry are regenerated; the rest of the output is kept as is.
+        manifest = Manifest(output_dir)
+        cfg_hash = config_hash()
+        tasks = []
+        up_to_date = 0
+        for filename in sorted(os.listdir(input_dir)):
+            with open(os.path.join(input_dir, filename), 'r', encoding='utf-8') as f:
+                original_code = f.read()
+            if manifest.is_current(filename, source_hash(original_code), cfg_hash, output_format):
+                up_to_date += 1
+            else:
+                tasks.append((filename, original_code))
+
+        store = MutantStore(output_dir) if packed else None
+        progress = _Progress(len(tasks))
+        print(f"{len(tasks)} originals to generate, {up_to_date} up to date", flush=True)
+        try:
+            if workers <= 1:
+                _init_worker(self)
+                results = map(_generate_file, tasks)
+                self._write_results(results, output_dir, store, manifest, cfg_hash, progress)
+            else:
+                with multiprocessing.Pool(workers, initializer=_init_worker) as pool:
+                    results = pool.imap(_generate_file, tasks, chunksize)
+                    self._write_results(results, output_dir, store, manifest, cfg_hash, progress)
+        finally:
+            if store is not None:
+                store.close()
+        progress.finish()
+
+    @staticmethod
+    def _write_results(results, output_dir, store, manifest, cfg_hash, progress):
+        for filename, original_code, samples, failures in results:
+            manifest.invalidate(filename)
+            outputs = []
+            if store is not None:
+                output_format = 'packed'
+                store.add_original(filename, original_code)
+                for sample in samples:
+                    i = sample['sample_index']
+                    store.add(filename, i, sample['mutated_code'], sample['mutation_info'])
+                    outputs.append(i)
+            else:
+                output_format = 'files'
+                for sample in samples:
+                    i = sample['sample_index']
+                    code_path = os.path.join(output_dir, f"{filename}_err_{i}.py")
+                    info_path = os.path.join(output_dir, f"{filename}_info_{i}.json")
+
+                    with open(code_path, 'w', encoding='utf-8') as f:
+                        f.write(sample['mutated_code'])
+
+                    with open(info_path, 'w', encoding='utf-8') as f_info:
+                        json.dump(sample['mutation_info'], f_info, indent=2, ensure_ascii=False)
+                    outputs += [os.path.basename(code_path), os.path.basename(info_path)]
+
+            # Outputs of a previous run that this one no longer produces (e.g. a smaller MUTATION_SIZE).
+            previous = manifest.get(filename)
+            if previous is not None and previous['format'] == output_format:
+                for stale in set(previous['outputs']) - set(outputs):
+                    if store is not None:
+                        store.discard(filename, stale)
+                    elif os.path.exists(os.path.join(output_dir, stale)):
+                        os.remove(os.path.join(output_dir, stale))
+            manifest.record(filename, source_hash(original_code), cfg_hash, output_format, outputs)
+            progress.update(filename, len(samples), failures)
+
+
+def normalized_hash(code):
+    """Content hash that ignores formatting: the AST if the code parses, else its non-blank lines."""
+    try:
+        normalized = ast.dump(ast.parse(code))
+    except (SyntaxError, ValueError):
+        normalized = '\n'.join(line.rstrip() for line in code.splitlines() if line.strip())
+    return source_hash(normalized)
+
+
+def bytecode_hash(code):
+    """Hash of the code objects ``code`` compiles to, or None if it does not compile.
+
+    Two programs with the same hash are trivially equivalent: the compiler emits
+    the same bytecode, constants and names for both.  Line numbers and the file
+    name are left out.
+    """
+    try:
+        compiled = compile(code, '<mutant>', 'exec', dont_inherit=True)
+    except (SyntaxError, ValueError):
+        return None
+    return source_hash(repr(_code_key(compiled)))
+
+
+def _code_key(co):
+    return (co.co_name, co.co_code, getattr(co, 'co_exceptiontable', b''), co.co_argcount,
+            co.co_posonlyargcount, co.co_kwonlyargcount, co.co_flags, co.co_names, co.co_varnames,
+            co.co_freevars, co.co_cellvars, tuple(_const_key(const) for const in co.co_consts))
+
+
+def _const_key(const):
+    if isinstance(const, types.CodeType):
+        return _code_key(const)
+    if isinstance(const, tuple):
+        return tuple(_const_key(item) for item in const)
+    if isinstance(const, frozenset):
+        # Set order depends on string hashing, which differs between processes.
+        return ('frozenset', tuple(sorted(repr(_const_key(item)) for item in const)))
+    return type(const).__name__, repr(const)
+
+
+class _Progress:
+    """One status line per original: position, mutant count and throughput."""
+
+    def __init__(self, total):
+        self.total = total
+        self.done = 0
+        self.mutants = 0
+        self.failures = 0
+        self.start = time.perf_counter()
+
+    def rate(self):
+        return self.mutants / max(time.perf_counter() - self.start, 1e-9)
+
+    def update(self, filename, count, failures=0):
+        self.done += 1
+        self.mutants += count
+        self.failures += failures
+        failed = f", {failures} failed applies" if failures else ""
+        print(f"[{self.done}/{self.total}] {filename}: {count} mutants{failed}, {self.rate():.1f} mutants/s",
+              flush=True)
+
+    def finish(self):
+        failed = f", {self.failures} failed applies" if self.failures else ""
+        print(f"generated {self.mutants} mutants from {self.done} originals{failed} "
+              f"in {time.perf_counter() - self.start:.1f}s ({self.rate():.1f} mutants/s)", flush=True)
+
+
+# Each worker process builds its own pipeline once and reuses it for every original it is given.
+_worker_pipeline = None
+
 
-            for i, sample in enumerate(samples):
-                code_path = os.path.join(output_dir, f"{filename}_err_{i}.py")
-                info_path = os.path.join(output_dir, f"{filename}_info_{i}.json")
+def _init_worker(pipeline=None):
+    global _worker_pipeline
+    _worker_pipeline = pipeline or DataPipeline()
 
-                with open(code_path, 'w', encoding='utf-8') as f:
-                    f.write(sample['mutated_code'])
 
-                with open(info_path, 'w', encoding='utf-8') as f_info:
-                    json.dump(sample['mutation_info'], f_info, indent=2, ensure_ascii=False)
+def _generate_file(task):
+    filename, original_code = task
+    failures = _worker_pipeline.apply_failures()
+    samples = _worker_pipeline.generate_samples(filename, original_code)
+    return filename, original_code, samples, _worker_pipeline.apply_failures() - failures
@@ -1,37 +1,14 @@
-import logging
-import math
+import argparse
+import importlib.util
 import os
 import random
+import sys
 
-import torch
-from torch import nn
-from transformers import AutoTokenizer, AutoModel, RobertaConfig, RobertaModel, RobertaTokenizer
-
-from Corrector.Dataset import CodeCorrectDataset, ReadData, Convert_examples_to_features
-from Corrector.translation.model import Seq2Seq
 from config import CONFIG
-from dataPipeline import DataPipeline
-from mutators.BracketMutator import BracketMutator
-from mutators.ColonMutator import ColonMutator
-from mutators.FunctionMutator import FunctionMutator
-from mutators.IndentMutator import IndentMutator
-from mutators.ModuleMutator import ModuleMutator
-from mutators.QuoteMutator import QuoteMutator
-from mutators.VariableNameMutator import VariableNameMutator
-from mutators.OperatorMutator import OperatorMutator
-from mutators.ConditionMutator import ConditionMutator
-from mutators.BoundaryMutator import BoundaryMutator
-from mutators.ArgMutator import ArgMutator
-from mutators.ArrayMutator import ArrayMutator
-from mutators.ControlFlowMutator import ControlFlowMutator
-from mutators.EmptyStructureMutator import EmptyStructureMutator
-from torch.utils.data import DataLoader, RandomSampler
-from Corrector.modelTrain import train, load_model, predict, BLEUEvaluate
-from Judge.statistic import run_python_files
-from Judge.statistic2 import save_statistics_report
-from Judge.statistic3 import Code_Analysis
+
 
 def test():
+    from mutators.ModuleMutator import ModuleMutator
     M = ModuleMutator()
     with open('datasets/s60.py', 'r') as f:
         correct_code = f.read()
@@ -72,6 +49,13 @@ def test3():
 
 
 def test4():
+    import torch
+    from torch import nn
+    from torch.utils.data import DataLoader, RandomSampler
+    from transformers import AutoTokenizer, AutoModel, RobertaConfig, RobertaModel, RobertaTokenizer
+    from Corrector.Dataset import CodeCorrectDataset, ReadData, Convert_examples_to_features
+    from Corrector.translation.model import Seq2Seq
+
     tokenizer = AutoTokenizer.from_pretrained(CONFIG.ENCODER_PATH)
     encoder = AutoModel.from_pretrained(CONFIG.ENCODER_PATH)
 
@@ -93,7 +77,8 @@ def test4():
         dataset,
         batch_size=CONFIG.BATCH_SIZE // CONFIG.GRADIENT_ACCUMULATION_STEPS,
         sampler=RandomSampler(dataset),
-        num_workers=4
+        num_workers=4,
+        collate_fn=dataset.collate_fn
     )
 
     batch = next(iter(train_loader))
@@ -112,6 +97,10 @@ def test4():
 
 
 def test5():
+    import torch
+    from Corrector.Dataset import Convert_examples_to_features
+    from Corrector.modelTrain import load_model, predict
+
     model, tokenizer = load_model(CONFIG.SAVE_DIR + "/pytorch_model.bin")
 
     examples = []
@@ -136,18 +125,19 @@ def test5():
 
 
 def test6():
-    mutators = [
-        QuoteMutator(),
-        FunctionMutator(),
-        OperatorMutator(),
-        ModuleMutator(),
-        VariableNameMutator(),
-        EmptyStructureMutator(),
-        ControlFlowMutator(),
-        ConditionMutator(),
-        IndentMutator(),
-        ColonMutator()
-    ]
+    from mutators import registry
+    mutators = registry.create([
+        'QuoteMutator',
+        'FunctionMutator',
+        'OperatorMutator',
+        'ModuleMutator',
+        'VariableNameMutator',
+        'EmptyStructureMutator',
+        'ControlFlowMutator',
+        'ConditionMutator',
+        'IndentMutator',
+        'ColonMutator'
+    ])
 
     datasets_folder = 'datasets'
     if not os.path.exists(datasets_folder):
@@ -173,26 +163,12 @@ def test7():
     with open('datasets/s1.py', 'r') as f:
         original_code = f.read()
 
-    mutators = [
-        BracketMutator(),
-        ColonMutator(),
-        FunctionMutator(),
-        IndentMutator(),
-        ModuleMutator(),
-        OperatorMutator(),
-        QuoteMutator(),
-        VariableNameMutator(),
-        ConditionMutator(),
-        BoundaryMutator(),
-        ArrayMutator(),
-        ArgMutator(),
-        ControlFlowMutator(),
-        EmptyStructureMutator()
-    ]
+    from mutators import registry
+    mutators = registry.create()
     available_mutators = [m for m in mutators if m.can_mutate(original_code)]
     mutators_with_none = available_mutators + [None]
     index_list = [mutators.index(m) for m in available_mutators]
-    available_rates = [CONFIG.MUTATION_RATE[i] for i in index_list]
+    available_rates = [registry.rate(type(m).__name__) for m in available_mutators]
 
     rates_with_none = available_rates + [1 - sum(CONFIG.MUTATION_RATE)]
 
@@ -205,27 +181,142 @@ def test7():
 
 
 def test8():
+    import torch
+    from Corrector.modelTrain import load_model, BLEUEvaluate
+
     model, tokenizer = load_model(CONFIG.SAVE_DIR + "/pytorch_model.bin")
     device = torch.device("cuda" if torch.cuda.is_available() and not CONFIG.NO_CUDA else "cpu")
 
     BLEUEvaluate(model, tokenizer, device, CONFIG.TEST_OUTPUT)
 
 
+def test9():
+    # Subword tokenization of the code tokens: per-token loop vs. one offset-mapped fast-tokenizer call.
+    import time
+    from transformers import AutoTokenizer
+    from Corrector.Dataset import ReadData, subword_tokens, subword_tokens_fast
+    from Corrector.translation.run import extract_dataflow, parser
+
+    tokenizer = AutoTokenizer.from_pretrained(CONFIG.ENCODER_PATH)
+    data = ReadData(CONFIG.TRAIN_DATA_DIR)[:2000]
+    code_tokens = [extract_dataflow(example['buggy_code'], parser, "python")[0] for example in data]
+
+    start = time.perf_counter()
+    loop = [subword_tokens(tokens, tokenizer) for tokens in code_tokens]
+    loop_time = time.perf_counter() - start
+    start = time.perf_counter()
+    fast = [subword_tokens_fast(tokens, tokenizer) for tokens in code_tokens]
+    fast_time = time.perf_counter() - start
+
+    fallback = sum(result is None for result in fast)
+    same = all(result is None or result == expected for result, expected in zip(fast, loop))
+    print(f"{len(code_tokens)} examples: loop {loop_time:.2f}s, fast {fast_time:.2f}s "
+          f"({loop_time / fast_time:.1f}x), {fallback} left to the loop, identical: {same}")
+
+
+def generate(args):
+    from dataPipeline import DataPipeline
+    DataPipeline().generate_dataset(args.input_dir, args.output_dir, workers=args.workers,
+                                    chunksize=args.chunksize, packed=args.packed or None)
+
+
+def judge(args):
+    from Judge.Judge import judge_all
+    judge_all(args.code_dir, args.rule_dir)
+
+
+def featurize(args):
+    from transformers import AutoTokenizer
+    from Corrector.Dataset import ReadData, Convert_examples_to_features
+
+    tokenizer = AutoTokenizer.from_pretrained(CONFIG.ENCODER_PATH)
+    features = Convert_examples_to_features(ReadData(args.data_dir), tokenizer, args.stage, workers=args.workers)
+    print(f"{len(features)} features from {args.data_dir}")
+
+
+def train_model(args):
+    from Corrector.modelTrain import train
+    train(args.eval)
+
+
+def predict_files(args):
+    import torch
+    from Corrector.Dataset import Convert_examples_to_features
+    from Corrector.modelTrain import load_model, predict
+
+    model, tokenizer = load_model(args.checkpoint)
+    files = sorted(f for f in os.listdir(args.input_dir) if f.endswith('.py'))
+    examples = []
+    for file in files:
+        with open(os.path.join(args.input_dir, file), "r", encoding="utf-8") as f:
+            examples.append({'buggy_code': f.read(), 'fixed_code': "None"})
+    feature = Convert_examples_to_features(examples, tokenizer, "test")
+    device = torch.device("cuda" if torch.cuda.is_available() and not CONFIG.NO_CUDA else "cpu")
+    for file, fixed_code in zip(files, predict(model, feature, tokenizer, device)):
+        print(f"# {file}")
+        print(fixed_code)
+
+
+def stats(args):
+    # The Judge.statistic* report modules are not part of every checkout.
+    report = {'run': 'statistic', 'summary': 'statistic2', 'analysis': 'statistic3'}[args.report]
+    if importlib.util.find_spec(f'Judge.{report}') is None:
+        sys.exit(f"stats {args.report}: Judge/{report}.py is not available in this checkout")
+    if args.report == 'run':
+        from Judge.statistic import run_python_files
+        run_python_files(args.code_dir, CONFIG.LOG_DIR)
+    elif args.report == 'summary':
+        from Judge.statistic2 import save_statistics_report
+        save_statistics_report(args.code_dir, CONFIG.LOG_DIR)
+    else:
+        from Judge.statistic3 import Code_Analysis
+        Code_Analysis(args.code_dir, CONFIG.LOG_DIR)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Mutation-based dataset generation and error correction.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    p = commands.add_parser('generate', help="generate mutants of the original programs")
+    p.add_argument('--input-dir', default=CONFIG.INPUT_DIR)
+    p.add_argument('--output-dir', default=CONFIG.OUTPUT_DIR)
+    p.add_argument('--workers', type=int, default=None)
+    p.add_argument('--chunksize', type=int, default=None)
+    p.add_argument('--packed', action='store_true', help="write a packed MutantStore instead of files")
+    p.set_defaults(func=generate)
+
+    p = commands.add_parser('judge', help="score mutants against the test rules")
+    p.add_argument('--code-dir', default=None)
+    p.add_argument('--rule-dir', default=None)
+    p.set_defaults(func=judge)
+
+    p = commands.add_parser('featurize', help="convert a generated dataset to model features")
+    p.add_argument('--data-dir', default=CONFIG.TRAIN_DATA_DIR)
+    p.add_argument('--stage', default='train')
+    p.add_argument('--workers', type=int, default=None)
+    p.set_defaults(func=featurize)
+
+    p = commands.add_parser('train', help="train the corrector model")
+    p.add_argument('--eval', action='store_true', help="evaluate on the held-out split at every fifth of CONFIG.EPOCHS")
+    p.set_defaults(func=train_model)
+
+    p = commands.add_parser('predict', help="correct every .py file of a directory")
+    p.add_argument('--input-dir', default='data/test_code')
+    p.add_argument('--checkpoint', default=CONFIG.SAVE_DIR + "/pytorch_model.bin")
+    p.set_defaults(func=predict_files)
+
+    p = commands.add_parser('stats', help="statistics over generated code")
+    p.add_argument('report', nargs='?', choices=['run', 'summary', 'analysis'], default='analysis')
+    p.add_argument('--code-dir', default=CONFIG.INPUT_DIR)
+    p.set_defaults(func=stats)
+    return parser
+
+
+def main(argv=None):
+    # Every subcommand imports what it needs, so generate and judge never load torch.
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
 if __name__ == '__main__':
-    # run_python_files(CONFIG.OUTPUT_DIR,CONFIG.LOG_DIR)
-    # save_statistics_report(CONFIG.OUTPUT_DIR, CONFIG.LOG_DIR)
-    Code_Analysis(CONFIG.INPUT_DIR, CONFIG.LOG_DIR)
-    # train(True)
-    # test5()
-    # test4()
-    # test6()
-    # test7()
-    # print(sum(CONFIG.MUTATION_RATE))
-    # test2()
-    # test3()
-    # test()
-    # pipeline = DataPipeline()
-    # pipeline.generate_dataset(
-    #     input_dir=CONFIG.INPUT_DIR,
-    #     output_dir=CONFIG.OUTPUT_DIR
-    # )
+    main(sys.argv[1:])
@@ -1,21 +1,10 @@
 import ast
-import random
-from ASTParser import ASTParser
 from mutators.BaseMutator import BaseMutator
 
 
-class ArrayIndexCollector(ast.NodeVisitor):
-
-    def __init__(self):
-        self.index_nodes = []
-
-    def visit_Subscript(self, node):
-        if isinstance(node.slice, ast.Index) or hasattr(ast, 'Constant'):
-            self.index_nodes.append(node)
-        self.generic_visit(node)
-
-
 class ArrayMutator(BaseMutator):
+    SITE_NODES = (ast.Subscript,)
+
     def __init__(self):
         super().__init__()
         self.index_operations = {
@@ -29,65 +18,33 @@ class ArrayMutator(BaseMutator):
     def init(self):
         super().init()
 
-    def can_mutate(self, code: str) -> bool:
-        tree = ASTParser.parse_to_tree(code)
-        if not tree:
-            return False
-
-        collector = ArrayIndexCollector()
-        collector.visit(tree)
-
-        return len(collector.index_nodes) > 0
-
-    def mutate(self, code: str) -> str:
-        tree = ASTParser.parse_to_tree(code)
-        if tree is None:
-            return code
-
-        collector = ArrayIndexCollector()
-        collector.visit(tree)
-        index_nodes = collector.index_nodes
-
-        if not index_nodes:
-            return code
-
-        target_node = random.choice(index_nodes)
-        mutation_type = self.select_mutation_type()
-
-        class IndexTransformer(ast.NodeTransformer):
-            def visit_Subscript(self, node):
-                if node == target_node:
-                    original_index = self._get_index_expression(node)
-                    mutated_index = outer_self._mutate_index(node.slice, mutation_type)
-
-                    new_node = ast.Subscript(
-                        value=node.value,
-                        slice=mutated_index,
-                        ctx=node.ctx
-                    )
-                    ast.copy_location(new_node, node)
-
-                    outer_self.record_mutation(
-                        mutator_type="ArrayMutator",
-                        mutate_type=mutation_type,
-                        line_num=getattr(node, 'lineno', 0),
-                        original_code=f"{ASTParser.tree_to_code(node.value)}[{original_index}]",
-                        mutated_code=f"{ASTParser.tree_to_code(new_node.value)}[{ASTParser.tree_to_code(new_node.slice)}]",
-                        description=f"Array index mutated: {original_index} → {ASTParser.tree_to_code(mutated_index)}"
-                    )
-                    outer_self.successful = True
-                    return new_node
-                return node
-
-            def _get_index_expression(self, node):
-                if isinstance(node.slice, (ast.Constant, ast.Name)):
-                    return ASTParser.tree_to_code(node.slice)
-                return ASTParser.tree_to_code(node.slice.value)
-
-        outer_self = self
-        mutated_tree = IndexTransformer().visit(tree)
-        ast.fix_missing_locations(mutated_tree)
-        return ASTParser.tree_to_code(mutated_tree)
+    def collect_sites(self, node, path, state, context):
+        index = node.slice
+        if isinstance(index, (ast.Name, ast.BinOp)) or (
+                isinstance(index, ast.Constant) and isinstance(index.value, int)):
+            for mutate_type in self.get_mutate_types():
+                self.add_site(state, mutate_type, path, context.span(node))
+
+    def apply(self, editor, site, context):
+        mutation_type = site.mutate_type
+        node = editor.node(site.path)
+        mutated_index = self._mutate_index(node.slice, mutation_type)
+
+        new_node = editor.replace(site.path, ast.Subscript(
+            value=node.value,
+            slice=mutated_index,
+            ctx=node.ctx
+        ))
+
+        self.record_mutation(
+            mutator_type="ArrayMutator",
+            mutate_type=mutation_type,
+            line_num=getattr(node, 'lineno', 0),
+            original_code=lambda: f"{ast.unparse(node.value)}[{ast.unparse(node.slice)}]",
+            mutated_code=lambda: f"{ast.unparse(new_node.value)}[{ast.unparse(new_node.slice)}]",
+            description=lambda: f"Array index mutated: {ast.unparse(node.slice)} → {ast.unparse(mutated_index)}"
+        )
+        self.successful = True
 
     def _mutate_index(self, index_node: ast.AST, mutation_type: str) -> ast.AST:
         if isinstance(index_node, (ast.Constant, ast.Name)):
@@ -97,7 +54,7 @@ class ArrayMutator(BaseMutator):
         return index_node
 
     def _handle_simple_index(self, node: ast.AST, mutation_type: str) -> ast.AST:
-        delta = random.randint(1, 3)
+        delta = self.rng.randint(1, 3)
 
         delta = delta if mutation_type == 'IndexIncrement' else -delta
 
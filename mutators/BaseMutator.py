@@ -1,17 +1,104 @@
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
-from typing import List
+from collections import Counter
+from enum import IntEnum
+from typing import List, Optional
+import ast
+import hashlib
+import logging
 import random
 
+from ASTParser import AnalysisContext, TreeEditor
+from CSTParser import CSTContext
+from SiteIndex import MutationSite, SiteIndex
+
+logger = logging.getLogger(__name__)
+
+# What applying a site that no longer fits the code it is applied to raises
+# (a stale path or line, an empty choice); anything else is a mutator bug.
+SITE_ERRORS = (IndexError, KeyError, ValueError)
+
+MutatorType = IntEnum('MutatorType', [
+    'BracketMutator', 'ColonMutator', 'FunctionMutator', 'IndentMutator', 'ModuleMutator', 'OperatorMutator',
+    'QuoteMutator', 'VariableNameMutator', 'ConditionMutator', 'BoundaryMutator', 'ArrayMutator', 'ArgMutator',
+    'ControlFlowMutator', 'EmptyStructureMutator'
+], start=0)
+
+MutateType = IntEnum('MutateType', [
+    'BDelete_start', 'BDelete_end', 'BAdd_extra', 'BReplace',
+    'CRemove', 'CReplace',
+    'FunctionReplace',
+    'IAdd_space', 'IRemove_space', 'IMix_tabs',
+    'ModuleReplace', 'ModuleRemove',
+    'BinOpSubs', 'CompareSubs',
+    'QSingle_to_double', 'QUnterminated', 'QEscape_remove',
+    'VRenew', 'VReplace',
+    'LogicOpReverse', 'ConditionNegate', 'BoundaryAdjust', 'PartialCondition',
+    'RangeStopInc', 'RangeStopDec', 'RangeStartInc', 'RangeStartDec', 'RangeStepInc', 'RangeStepDec',
+    'IndexIncrement', 'IndexDecrement',
+    'RemoveArg', 'RemoveKwarg',
+    'FlowKeywordSwap',
+    'EmptyInitSwap'
+], start=0)
+
 
-@dataclass
 class MutationRecord:
-    mutator_type: str
-    mutate_type: str
-    line_num: int
-    original_code: str
-    mutated_code: str
-    description: str
+    """What one mutation did, rendered to text only when it is serialized.
+
+    The mutator and mutation type are stored as integer codes (plugin ones,
+    which have none, as their names).  Code and description fields may be given
+    as text, as an AST node (unparsed on first access) or as a zero-argument
+    callable, so mutations that are never written out never pay for unparsing.
+    A node must not be modified after it is recorded: pass the untouched shared
+    node for the original code.
+    """
+
+    __slots__ = ('mutator', 'mutate', 'line_num', '_original_code', '_mutated_code', '_description')
+
+    def __init__(self, mutator_type, mutate_type, line_num: int, original_code, mutated_code, description=""):
+        self.mutator = self._code(MutatorType, mutator_type)
+        self.mutate = self._code(MutateType, mutate_type)
+        self.line_num = line_num
+        self._original_code = original_code
+        self._mutated_code = mutated_code
+        self._description = description
+
+    @staticmethod
+    def _code(enum, value):
+        # Plugin mutators and their mutation types have no code and keep their name.
+        if isinstance(value, str):
+            return enum.__members__.get(value, value)
+        return enum(value)
+
+    @staticmethod
+    def _text(value) -> str:
+        if isinstance(value, str):
+            return value
+        if isinstance(value, ast.AST):
+            return ast.unparse(value)
+        return value()
+
+    @property
+    def mutator_type(self) -> str:
+        return getattr(self.mutator, 'name', self.mutator)
+
+    @property
+    def mutate_type(self) -> str:
+        return getattr(self.mutate, 'name', self.mutate)
+
+    @property
+    def original_code(self) -> str:
+        self._original_code = self._text(self._original_code)
+        return self._original_code
+
+    @property
+    def mutated_code(self) -> str:
+        self._mutated_code = self._text(self._mutated_code)
+        return self._mutated_code
+
+    @property
+    def description(self) -> str:
+        self._description = self._text(self._description)
+        return self._description
 
     def __str__(self):
         return (
@@ -24,39 +111,178 @@ class MutationRecord:
         )
 
 
+def log_apply_error(mutator, error: Exception, site: MutationSite = None):
+    """Log a failed apply under the mutator's name; unexpected errors with their traceback."""
+    where = f" {site.mutate_type} at line {site.lineno}" if site is not None else ""
+    if isinstance(error, SITE_ERRORS):
+        logger.debug("%s could not apply%s: %r", type(mutator).__name__, where, error)
+    else:
+        logger.error("%s failed to apply%s", type(mutator).__name__, where, exc_info=error)
+
+
+def sample_rng(code_hash: str, sample_index: int, step: int = -1, attempt: int = 0) -> random.Random:
+    """Generator for one step of one sample, seeded only from (original hash, sample, step).
+
+    Step -1 is used for sampling the chain itself; ``attempt`` numbers the retries
+    of a step.  The seed does not depend on call order, process or platform.
+    """
+    key = f"{code_hash}:{sample_index}:{step}" + (f":{attempt}" if attempt else '')
+    digest = hashlib.sha256(key.encode('utf-8')).digest()
+    return random.Random(int.from_bytes(digest[:8], 'big'))
+
+
 class BaseMutator(ABC):
+    # AST node types routed to collect_sites() during the shared SiteIndex walk.
+    SITE_NODES = ()
+    # Text-level mutators edit source lines and leave code ast.parse rejects;
+    # an edit that still parses is not realized (see breaks_syntax).
+    TEXT_LEVEL = False
+    # tree-sitter node types routed to collect_cst_sites(); mutators that list
+    # none have no CST (broken-code) support.
+    CST_NODES = ()
+
     def __init__(self):
         self.mutation_record = None
         self.successful = False
+        # Every random draw goes through this generator; the pipeline injects a
+        # seeded one per chain step (see sample_rng).
+        self.rng = random.Random()
 
     @abstractmethod
     def get_mutate_types(self) -> List[str]:
         pass
 
     @abstractmethod
-    def mutate(self, code: str) -> str:
-        pass
-    @abstractmethod
     def init(self):
         self.successful = False
         self.mutation_record = None
 
-    @abstractmethod
-    def can_mutate(self, code: str) -> bool:
+    @staticmethod
+    def get_context(code: str, context: Optional[AnalysisContext] = None) -> AnalysisContext:
+        if context is None or not context.matches(code):
+            context = AnalysisContext(code)
+        return context
+
+    def collect_sites(self, node: ast.AST, path: tuple, state: dict, context: AnalysisContext):
         pass
 
-    def select_mutation_type(self):
-        return random.choice(self.get_mutate_types())
+    def finish_sites(self, state: dict, context: AnalysisContext) -> list:
+        return state.get('sites', [])
+
+    @staticmethod
+    def add_site(state: dict, mutate_type: str, path: tuple, span: tuple, key: str = ''):
+        state.setdefault('sites', []).append((mutate_type, path, span, key))
+
+    def find_sites(self, context: AnalysisContext) -> List[MutationSite]:
+        name = type(self).__name__
+        index = context.sites
+        if index is None or not index.covers(name):
+            index = SiteIndex.build(context, [self])
+        return index.for_mutator(name)
+
+    def can_mutate(self, code: str, context: Optional[AnalysisContext] = None) -> bool:
+        return bool(self.find_sites(self.get_context(code, context)))
+
+    def mutate(self, code: str, context: Optional[AnalysisContext] = None,
+               site: Optional[MutationSite] = None) -> str:
+        context = self.get_context(code, context)
+        if site is None:
+            sites = self.find_sites(context)
+            if not sites:
+                return code
+            site = self.select_site(sites)
+        return self.apply_site(context, site)
+
+    def apply_site(self, context: AnalysisContext, site: MutationSite) -> str:
+        if self.TEXT_LEVEL:
+            return self.render_lines(context, self.apply_lines(context, site))
+        if context.tree is None:
+            return context.source
+        editor = context.editor()
+        self.apply(editor, site, context)
+        return editor.render()
+
+    @staticmethod
+    def render_lines(context: AnalysisContext, changes: dict) -> str:
+        """Splice edited lines back into the source, keeping every other byte as is."""
+        return context.splice([context.line_span(i) + (line,) for i, line in changes.items()])
+
+    @staticmethod
+    def breaks_syntax(context: AnalysisContext, changes: dict) -> bool:
+        """Whether the source with ``changes`` (as from apply_lines) no longer parses."""
+        try:
+            ast.parse(BaseMutator.render_lines(context, changes))
+        except (SyntaxError, ValueError):
+            return True
+        return False
+
+    def apply_lines(self, context: AnalysisContext, site: MutationSite) -> dict:
+        """Text-level mutators return {0-based line number: new line content}."""
+        raise NotImplementedError
+
+    def apply(self, editor: TreeEditor, site: MutationSite, context: AnalysisContext):
+        raise NotImplementedError
+
+    def collect_cst_sites(self, node, state: dict, context: CSTContext):
+        pass
+
+    @staticmethod
+    def add_cst_site(state: dict, mutate_type: str, node, key: str = ''):
+        state.setdefault('sites', []).append((mutate_type, CSTContext.path(node), CSTContext.span(node), key))
+
+    def apply_cst(self, context: CSTContext, site: MutationSite) -> list:
+        """CST mutators return the (start_byte, end_byte, text) replacements for ``site``."""
+        raise NotImplementedError
+
+    def record_cst_mutation(self, context: CSTContext, site: MutationSite, patches: list, description: str):
+        original_lines, mutated_lines = context.patched_lines(patches)
+        self.record_mutation(
+            mutator_type=type(self).__name__,
+            mutate_type=site.mutate_type,
+            line_num=site.lineno,
+            original_code=original_lines,
+            mutated_code=mutated_lines,
+            description=description
+        )
+        self.successful = True
+
+    def type_weights(self, mutate_types: List[str]) -> List[float]:
+        """Relative probability of each mutation type in select_mutation_type."""
+        return [1.0] * len(mutate_types)
+
+    def select_mutation_type(self, mutate_types: Optional[List[str]] = None):
+        return self.rng.choice(mutate_types or self.get_mutate_types())
+
+    def select_site(self, sites: List[MutationSite]) -> MutationSite:
+        by_type = {}
+        for site in sites:
+            by_type.setdefault(site.mutate_type, []).append(site)
+        mutate_type = self.select_mutation_type(list(by_type))
+        return self.rng.choice(by_type[mutate_type])
+
+    def site_order(self, sites: List[MutationSite], seed: str) -> List[MutationSite]:
+        """Seeded weighted permutation of ``sites``, for drawing them without replacement.
+
+        Each type's weight is shared among its sites, so walking the order from the
+        front picks types with the same distribution as select_site.
+        """
+        rng = random.Random(seed)
+        counts = Counter(site.mutate_type for site in sites)
+        weights = dict(zip(counts, self.type_weights(list(counts))))
+        # Efraimidis-Spirakis: sorting by u ** (1 / w) descending samples without replacement.
+        keys = [rng.random() ** (counts[site.mutate_type] / weights[site.mutate_type]) for site in sites]
+        return [site for _, site in sorted(zip(keys, sites), key=lambda pair: -pair[0])]
 
     def record_mutation(
         self,
         mutator_type: str,
         mutate_type: str,
         line_num: int,
-        original_code: str,
-        mutated_code: str,
-        description: str = ""
+        original_code,
+        mutated_code,
+        description=""
     ):
+        """Code and description may be text, AST nodes or callables; see MutationRecord."""
         self.mutation_record = MutationRecord(
             mutator_type=mutator_type,
             mutate_type=mutate_type,
@@ -1,10 +1,11 @@
 import ast
-import random
-from ASTParser import ASTParser
 from mutators.BaseMutator import BaseMutator
 
 
 class BoundaryMutator(BaseMutator):
+    SITE_NODES = (ast.For,)
+    ARG_INDEX = {'Start': 0, 'Stop': 1, 'Step': 2}
+
     def __init__(self):
         super().__init__()
         self.original_code = None
@@ -22,27 +23,31 @@ class BoundaryMutator(BaseMutator):
         super().init()
         self.original_code = None
 
-    def can_mutate(self, code: str) -> bool:
-        tree = ASTParser.parse_to_tree(code)
-        class RangeChecker(ast.NodeVisitor):
-            def __init__(self):
-                self.found = False
-
-            def visit_For(self, node):
-                if isinstance(node.iter, ast.Call) and isinstance(node.iter.func,
-                                                                  ast.Name) and node.iter.func.id == 'range':
-                    self.found = True
-
-        checker = RangeChecker()
-        checker.visit(tree)
-        return checker.found
+    def collect_sites(self, node, path, state, context):
+        if isinstance(node.iter, ast.Call) and isinstance(node.iter.func,
+                                                          ast.Name) and node.iter.func.id == 'range':
+            args = node.iter.args
+            mutate_types = self.get_mutate_types()
+            if len(args) == 1:
+                mutate_types = mutate_types[2:3]
+            elif len(args) == 2:
+                mutate_types = mutate_types[0:4]
+            else:
+                mutate_types = mutate_types[0:5]
+            for mutate_type in mutate_types:
+                arg_index = self.ARG_INDEX[mutate_type[5:-3]]
+                if len(args) > arg_index and self._is_shiftable(args[arg_index]):
+                    self.add_site(state, mutate_type, path + (('iter', None),), context.span(node.iter))
+
+    @staticmethod
+    def _is_shiftable(arg):
+        return isinstance(arg, ast.Name) or (isinstance(arg, ast.Constant) and isinstance(arg.value, int))
 
     def shift_boundary(self, mutate_type, node):
-        shiftScale = random.randint(1, 3)
+        shiftScale = self.rng.randint(1, 3)
 
         args = node.args
 
-        print("code2:", ASTParser.tree_to_code(node))
         if mutate_type == 'RangeStopInc':
             if isinstance(args[1], ast.Constant):
                 args[1].value += shiftScale
@@ -79,45 +84,13 @@ class BoundaryMutator(BaseMutator):
             mutate_type=mutate_type,
             line_num=getattr(node, 'lineno', 0),
             original_code=self.original_code,
-            mutated_code=ASTParser.tree_to_code(node),
+            mutated_code=node,
             description=f"{mutate_type} {shiftScale}"
         )
         self.successful = True
         return node
 
-    def mutate(self, code: str) -> str:
-
-        self.code = code
-        print("code1:", self.code)
-
-        tree = ASTParser.parse_to_tree(code)
-
-        outer_self = self
-
-        class BoundaryTransformer(ast.NodeTransformer):
-            def visit_For(self, node):
-                self.generic_visit(node)
-                if isinstance(node.iter, ast.Call) and isinstance(node.iter.func,
-                                                                  ast.Name) and node.iter.func.id == 'range':
-                    args = node.iter.args
-                    outer_self.original_code = ASTParser.tree_to_code(node.iter)
-                    mutate_types = outer_self.get_mutate_types()
-
-                    if len(args) == 1:
-                        mutate_types = mutate_types[2:3]
-                        mutate_type = random.choice(mutate_types)
-                    elif len(args) == 2:
-                        mutate_types = mutate_types[0:4]
-                        mutate_type = random.choice(mutate_types)
-                    else:
-                        mutate_types = mutate_types[0:5]
-                        mutate_type = random.choice(mutate_types)
-                    node.iter = outer_self.shift_boundary(mutate_type, node.iter)
-                    return node
-
-                return node
-
-        transformer = BoundaryTransformer()
-        mutated_tree = transformer.visit(tree)
-
-        return ASTParser.tree_to_code(mutated_tree)
+    def apply(self, editor, site, context):
+        self.original_code = editor.node(site.path)
+        node = editor.touch(site.path)
+        self.shift_boundary(site.mutate_type, node)
@@ -1,9 +1,20 @@
-from ASTParser import ASTParser
 from mutators.BaseMutator import BaseMutator
-import random
 
 
 class BracketMutator(BaseMutator):
+    """Breaks one bracket pair.
+
+    Pairs come from the token stream, so they may span lines and brackets in
+    strings and comments are not sites (the line scan before the site index
+    only matched pairs within a line).  BReplace always picks a different pair;
+    it used to pick the original one a third of the time and change nothing.
+    """
+
+    TEXT_LEVEL = True
+    CST_NODES = ('argument_list', 'parameters', 'parenthesized_expression', 'tuple', 'list', 'dictionary', 'set',
+                 'subscript', 'list_comprehension', 'dictionary_comprehension', 'set_comprehension',
+                 'generator_expression')
+
     def __init__(self):
         super().__init__()
         self.BRACKET_PAIRS = {'(': ')', '[': ']', '{': '}'}
@@ -16,17 +27,19 @@ class BracketMutator(BaseMutator):
         super().init()
         self._mutation_applied = False
 
-    def can_mutate(self, code: str) -> bool:
-        return bool(self._find_all_bracket_pairs(code))
+    def finish_sites(self, state, context):
+        sites = []
+        for start_line, start_pos, end_line, end_pos in context.token_index.bracket_pairs:
+            span = (start_line, start_pos, end_line, end_pos + 1)
+            for mutation_type in self.get_mutate_types():
+                sites.append((mutation_type, (), span, ''))
+        return sites
 
-    def mutate(self, code: str) -> str:
-        lines = code.splitlines()
-        bracket_pairs = self._find_all_bracket_pairs(code)
-        if not bracket_pairs:
-            return code
-
-        start_pos, end_pos, start_line, end_line = random.choice(bracket_pairs)
-        mutation_type = self.select_mutation_type()
+    def apply_lines(self, context, site):
+        lines = list(context.lines)
+        start_pos, end_pos = site.col_offset, site.end_col_offset - 1
+        start_line, end_line = site.lineno - 1, site.end_lineno - 1
+        mutation_type = site.mutate_type
 
         original_start_line = lines[start_line]
         original_end_line = lines[end_line] if start_line != end_line else original_start_line
@@ -38,16 +51,16 @@ class BracketMutator(BaseMutator):
             lines[end_line] = original_end_line[:end_pos] + original_end_line[end_pos + 1:]
             desc = f"Deleted closing bracket at line {end_line + 1}"
         elif mutation_type == 'BAdd_extra':
-            new_bracket = random.choice(list(self.BRACKET_PAIRS.keys()))
+            new_bracket = self.rng.choice(list(self.BRACKET_PAIRS.keys()))
             lines[start_line] = original_start_line[:start_pos] + new_bracket + original_start_line[start_pos:]
             desc = f"Added extra opening {new_bracket} at line {start_line + 1}"
-        elif mutation_type == 'BReplace':
-            new_pair = random.choice(list(self.BRACKET_PAIRS.items()))
+        else:
+            new_pair = self.rng.choice([pair for pair in self.BRACKET_PAIRS.items()
+                                        if pair[0] != original_start_line[start_pos]])
             lines[start_line] = original_start_line[:start_pos] + new_pair[0] + original_start_line[start_pos + 1:]
-            lines[end_line] = original_end_line[:end_pos] + new_pair[1] + original_end_line[end_pos + 1:]
+            lines[end_line] = lines[end_line][:end_pos] + new_pair[1] + lines[end_line][end_pos + 1:]
             desc = f"Replaced brackets with {new_pair[0]}{new_pair[1]} at lines {start_line + 1}-{end_line + 1}"
 
-
         self.record_mutation(
             mutator_type="BracketMutator",
             mutate_type=mutation_type,
@@ -58,25 +71,39 @@ class BracketMutator(BaseMutator):
         )
         self.successful = True
 
-        return '\n'.join(lines)
-
-    def _find_all_bracket_pairs(self, code: str):
-        lines = code.splitlines()
-        bracket_pairs = []
+        return {start_line: lines[start_line], end_line: lines[end_line]}
 
-        for line_num, line in enumerate(lines):
-            stack = []
-            for pos, char in enumerate(line):
-                if char in self.BRACKET_PAIRS:
-                    stack.append((char, pos, line_num))
-                elif char in self.BRACKET_PAIRS.values():
-                    if stack and self.BRACKET_PAIRS[stack[-1][0]] == char:
-                        start_char, start_pos, start_line = stack.pop()
-                        bracket_pairs.append((
-                            start_pos,
-                            pos,
-                            start_line,
-                            line_num
-                        ))
+    def collect_cst_sites(self, node, state, context):
+        stack = []
+        for child in node.children:
+            if child.is_missing:
+                continue
+            if child.type in self.BRACKET_PAIRS:
+                stack.append(child)
+            elif stack and child.type == self.BRACKET_PAIRS[stack[-1].type]:
+                opening = stack.pop()
+                state.setdefault('sites', []).extend(
+                    (mutation_type, ((opening.start_byte, child.end_byte),),
+                     (opening.start_point[0] + 1, opening.start_point[1], child.end_point[0] + 1, child.end_point[1]),
+                     '')
+                    for mutation_type in self.get_mutate_types())
 
-        return bracket_pairs
\ No newline at end of file
+    def apply_cst(self, context, site):
+        (start, end), = site.path
+        if site.mutate_type == 'BDelete_start':
+            patches = [(start, start + 1, '')]
+            desc = f"Deleted opening bracket at line {site.lineno}"
+        elif site.mutate_type == 'BDelete_end':
+            patches = [(end - 1, end, '')]
+            desc = f"Deleted closing bracket at line {site.end_lineno}"
+        elif site.mutate_type == 'BAdd_extra':
+            new_bracket = self.rng.choice(list(self.BRACKET_PAIRS.keys()))
+            patches = [(start, start, new_bracket)]
+            desc = f"Added extra opening {new_bracket} at line {site.lineno}"
+        else:
+            current = context.text(start, start + 1)
+            new_pair = self.rng.choice([pair for pair in self.BRACKET_PAIRS.items() if pair[0] != current])
+            patches = [(start, start + 1, new_pair[0]), (end - 1, end, new_pair[1])]
+            desc = f"Replaced brackets with {new_pair[0]}{new_pair[1]} at lines {site.lineno}-{site.end_lineno}"
+        self.record_cst_mutation(context, site, patches, desc)
+        return patches
@@ -0,0 +1,58 @@
+from CSTParser import CSTContext
+from SiteIndex import source_hash
+from mutators.BaseMutator import sample_rng
+from mutators.ChainExecutor import ChainExecutor
+
+
+class CSTChainExecutor(ChainExecutor):
+    """Applies a mutator chain on tree-sitter's CST, for code ``ast.parse`` rejects.
+
+    Only mutators with CST support (``CST_NODES``) can take part.  Each step
+    picks a site of the current tree that is clear of the earlier edits, turns
+    it into byte-range replacements and applies them with one incremental
+    reparse, so the next step sees the edited program.  Steps are seeded and
+    retried like in ChainExecutor.run.
+    """
+
+    def __init__(self, parser=None):
+        super().__init__()
+        self.parser = parser
+
+    def run(self, code: str, chain: list, sample_index: int = 0, ordinals: list = None, retry=None):
+        """Returns the mutated code and the realized chain as (unrendered) single_Info records."""
+        realized = []
+        self.applied = 0
+        context = CSTContext(code, self.parser)
+        code_hash = source_hash(code)
+        mutators = [m for m in chain if m is not None]
+        for step, mutator in enumerate(chain):
+            if mutator is None:
+                continue
+            tried = []
+            attempt = 0
+            applied = False
+            while True:
+                mutator.rng = sample_rng(code_hash, sample_index, step, attempt)
+                index = context.sites
+                if index is None or not index.covers(type(mutator).__name__):
+                    index = context.index_sites(list(dict.fromkeys(mutators + [mutator])))
+                sites = [s for s in index.for_mutator(type(mutator).__name__) if context.is_free(s)]
+                if sites:
+                    site = mutator.select_site(sites)
+                    try:
+                        context.apply(mutator.apply_cst(context, site))
+                        applied = True
+                    except Exception as e:
+                        self._failed(mutator, e, site)
+                    if mutator.successful:
+                        self._realize(mutator, realized)
+                        break
+                mutator.init()
+                tried.append(mutator)
+                substitute = retry(mutator, tried) if retry is not None else None
+                if substitute is None:
+                    break
+                mutator = substitute[0]
+                attempt += 1
+            self.applied += applied
+        return context.source, realized
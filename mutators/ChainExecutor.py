@@ -0,0 +1,153 @@
+from collections import Counter
+
+from ASTParser import AnalysisContext
+from SiteIndex import source_hash
+from mutators.BaseMutator import BaseMutator, log_apply_error, sample_rng
+
+
+def render_info(realized: list) -> list:
+    """Render the MutationRecords of a realized chain to text, in place."""
+    for record in realized:
+        record['mutated_info'] = str(record['mutated_info'])
+    return realized
+
+
+def spans_overlap(a, b) -> bool:
+    return (a.lineno, a.col_offset) < (b.end_lineno, b.end_col_offset) \
+        and (b.lineno, b.col_offset) < (a.end_lineno, a.end_col_offset)
+
+
+class ChainExecutor:
+    """Applies a sampled mutator chain in a single pass.
+
+    Semantic (AST) mutators all edit one copy-on-write view of the shared tree,
+    which is rendered once.
+    Text-level mutators run afterwards on the rendered code, because their output
+    no longer parses; a text step whose result still parses is not realized.  A
+    step only uses sites that do not overlap an earlier edit of the same chain,
+    so no step invalidates another.
+
+    Each step draws from ``sample_rng(hash of the original, sample_index, step)``,
+    where ``step`` is the mutator's position in the sampled chain.
+
+    With ``ordinals`` (one per chain step) a step takes the ordinal-th site of the
+    mutator's seeded site order instead of a random one, so successive uses of a
+    mutator on the same original draw its sites without replacement.
+
+    When a step cannot be realized (no free site, or the mutator fails) and a
+    ``retry(failed, tried)`` callback is given, the step is retried with the
+    (mutator, ordinal) it returns, until it returns None.
+
+    Records keep the MutationRecord itself under ``mutated_info``; render_info
+    turns them into text once a sample is kept.
+
+    Applies that raise count as failed steps; ``failures`` counts them per
+    mutator and each one is logged (see log_apply_error).  ``applied`` is the
+    number of steps of the last run in which a mutator applied without raising,
+    realized or not.
+    """
+
+    def __init__(self):
+        self.failures = Counter()
+        self.applied = 0
+
+    def run(self, context: AnalysisContext, chain: list, sample_index: int = 0, ordinals: list = None,
+            retry=None):
+        """Returns the mutated code and the realized chain as (unrendered) single_Info records."""
+        realized = []
+        self.applied = 0
+        code_hash = context.sites.code_hash if context.sites is not None else source_hash(context.source)
+        steps = [(step, m) for step, m in enumerate(chain) if m is not None]
+        semantic = [(step, m) for step, m in steps if not m.TEXT_LEVEL]
+        syntactic = [(step, m) for step, m in steps if m.TEXT_LEVEL]
+
+        code = context.source
+        if semantic and context.tree is not None:
+            editor = context.editor()
+            claimed = []
+
+            def apply_semantic(mutator, site):
+                mutator.apply(editor, site, context)
+                editor.seal()
+                claimed.append(site)
+
+            for step, mutator in semantic:
+                self._run_step(context, step, mutator, code_hash, sample_index, ordinals, retry, realized,
+                               lambda s: not any(spans_overlap(s, other) for other in claimed),
+                               apply_semantic)
+            code = editor.render()
+
+        if syntactic:
+            if code is not context.source:
+                context = AnalysisContext(code)
+                context.index_sites(list({type(m): m for _, m in syntactic}.values()))
+            changes = {}
+
+            def apply_syntactic(mutator, site):
+                lines = mutator.apply_lines(context, site)
+                if not BaseMutator.breaks_syntax(context, {**changes, **lines}):
+                    mutator.init()  # still valid code: not a syntax error, so not realized
+                    return
+                changes.update(lines)
+
+            for step, mutator in syntactic:
+                self._run_step(context, step, mutator, code_hash, sample_index, ordinals, retry, realized,
+                               lambda s: not any(i in changes for i in range(s.lineno - 1, s.end_lineno)),
+                               apply_syntactic)
+            code = BaseMutator.render_lines(context, changes)
+
+        return code, realized
+
+    def _run_step(self, context, step, mutator, code_hash, sample_index, ordinals, retry, realized, is_free, apply):
+        ordinal = None if ordinals is None else ordinals[step]
+        tried = []
+        attempt = 0
+        applied = False
+        while True:
+            mutator.rng = sample_rng(code_hash, sample_index, step, attempt)
+            candidates = mutator.find_sites(context)
+            sites = [s for s in candidates if is_free(s)]
+            if sites:
+                site = self._select(mutator, candidates, sites, code_hash, ordinal)
+                try:
+                    apply(mutator, site)
+                    applied = True
+                except Exception as e:
+                    self._failed(mutator, e, site)
+                if mutator.successful:
+                    self._realize(mutator, realized)
+                    break
+            mutator.init()
+            tried.append(mutator)
+            substitute = retry(mutator, tried) if retry is not None else None
+            if substitute is None:
+                break
+            mutator, ordinal = substitute
+            attempt += 1
+        self.applied += applied
+
+    def _failed(self, mutator, error, site):
+        self.failures[type(mutator).__name__] += 1
+        log_apply_error(mutator, error, site)
+        mutator.init()
+
+    @staticmethod
+    def _select(mutator, candidates, sites, code_hash, ordinal):
+        if ordinal is None:
+            return mutator.select_site(sites)
+        order = mutator.site_order(candidates, f"{code_hash}:{type(mutator).__name__}")
+        allowed = set(sites)
+        # Continue past sites this chain has already covered; wrap around once exhausted.
+        for i in range(len(order)):
+            site = order[(ordinal + i) % len(order)]
+            if site in allowed:
+                return site
+
+    @staticmethod
+    def _realize(mutator, realized):
+        if mutator.successful:
+            realized.append({
+                'mutated_info': mutator.mutation_record,
+                'mutator_type': type(mutator).__name__
+            })
+        mutator.init()
@@ -0,0 +1,92 @@
+from collections import Counter
+from typing import Callable, List, Optional
+
+from ASTParser import AnalysisContext
+from SiteIndex import source_hash
+from config import CONFIG
+from mutators.ChainExecutor import spans_overlap
+
+
+class ChainPlanner:
+    """Turns a sampled chain into one the executor can realize in full.
+
+    Text-level mutators leave code that no longer parses, so the planned chain
+    runs every AST mutator first and at most ``max_text`` text mutators last.
+
+    Sites are checked up front.  AST steps all see the original's sites, so the
+    planner replays the executor's choice (the ordinal-th free site of the
+    mutator's seeded order) and knows which step would find no site that is
+    free of the earlier edits.  Text steps run on the code the AST steps
+    produced, so for them it only bounds the uses: each text mutator at most
+    as often as it has sites, and all of them together at most once per line
+    that has a text site, since each edits whole lines.
+
+    A draw that does not fit is redrawn among the mutators that do (same level
+    first), or dropped when none does.
+    """
+
+    def __init__(self, available: list, context: AnalysisContext, max_text: Optional[int] = None):
+        self.available = available
+        self.sites = {type(m).__name__: m.find_sites(context) for m in available}
+        self.code_hash = context.sites.code_hash if context.sites is not None else source_hash(context.source)
+        text_lines = {line for m in available if m.TEXT_LEVEL
+                      for site in self.sites[type(m).__name__] for line in range(site.lineno, site.end_lineno + 1)}
+        max_text = CONFIG.MAX_TEXT_MUTATORS if max_text is None else max_text
+        self.max_text = len(text_lines) if max_text is None else min(max_text, len(text_lines))
+        self._orders = {}
+
+    def plan(self, chain: list, rng, redraw: Callable[[list, object], object], base: int = 0) -> List:
+        """Order ``chain`` and replace the draws it cannot realize.
+
+        ``redraw(candidates, rng)`` picks a substitute among ``candidates``, and
+        ``base`` is the ordinal of each mutator's first use in this chain (the
+        sample index; see MutationSampler).
+        """
+        state = {'used': Counter(), 'claimed': [], 'text_left': self.max_text}
+        planned = []
+        for mutator in chain:
+            site = self._fit(mutator, state, base)
+            if site is None:
+                mutator, site = self._substitute(mutator, state, base, rng, redraw)
+                if mutator is None:
+                    continue
+            state['used'][type(mutator).__name__] += 1
+            if mutator.TEXT_LEVEL:
+                state['text_left'] -= 1
+            else:
+                state['claimed'].append(site)
+            planned.append(mutator)
+        return [m for m in planned if not m.TEXT_LEVEL] + [m for m in planned if m.TEXT_LEVEL]
+
+    def _fit(self, mutator, state: dict, base: int):
+        """The site the step would use, True for a text step that fits, or None."""
+        name = type(mutator).__name__
+        if mutator.TEXT_LEVEL:
+            return True if state['text_left'] > 0 and state['used'][name] < len(self.sites[name]) else None
+        order = self._order(mutator)
+        ordinal = base + state['used'][name]
+        for i in range(len(order)):
+            site = order[(ordinal + i) % len(order)]
+            if not any(spans_overlap(site, other) for other in state['claimed']):
+                return site
+        return None
+
+    def _substitute(self, mutator, state: dict, base: int, rng, redraw):
+        fitting = {}
+        for candidate in self.available:
+            site = self._fit(candidate, state, base)
+            if site is not None:
+                fitting[candidate] = site
+        same_level = [m for m in fitting if m.TEXT_LEVEL == mutator.TEXT_LEVEL]
+        for candidates in (same_level, list(fitting)):
+            if candidates:
+                substitute = redraw(candidates, rng)
+                if substitute is not None:
+                    return substitute, fitting[substitute]
+        return None, None
+
+    def _order(self, mutator) -> list:
+        name = type(mutator).__name__
+        if name not in self._orders:
+            self._orders[name] = mutator.site_order(self.sites[name], f"{self.code_hash}:{name}")
+        return self._orders[name]
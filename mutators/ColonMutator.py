@@ -1,10 +1,13 @@
-from ASTParser import ASTParser
 from mutators.BaseMutator import BaseMutator
 import ast
-import random
 
 
 class ColonMutator(BaseMutator):
+    SITE_NODES = (ast.FunctionDef, ast.If, ast.For)
+    TEXT_LEVEL = True
+    CST_NODES = ('function_definition', 'if_statement', 'elif_clause', 'else_clause', 'for_statement',
+                 'while_statement')
+
     def __init__(self):
         super().__init__()
 
@@ -14,51 +17,51 @@ class ColonMutator(BaseMutator):
     def init(self):
         super().init()
 
-    def can_mutate(self, code: str) -> bool:
-        tree = ASTParser.parse_to_tree(code)
-        if not tree:
-            return False
-
-        lines = code.splitlines()
-        for node in ast.walk(tree):
-            if isinstance(node, (ast.FunctionDef, ast.If, ast.For)):
-                line_num = node.lineno - 1
-                if 0 <= line_num < len(lines):
-                    line = lines[line_num]
-                    if ':' in line[node.col_offset:]:  # 冒号出现在语法结构之后
-                        return True
-        return False
+    def collect_sites(self, node, path, state, context):
+        # The header colon is the first colon after the statement start that is not
+        # inside brackets, a string or a comment (slices, dicts and annotations are skipped).
+        colon = context.token_index.colon_after(node.lineno, context.char_col(node.lineno, node.col_offset))
+        if colon is not None:
+            lineno, colon_pos = colon
+            for mutation_type in self.get_mutate_types():
+                self.add_site(state, mutation_type, path, (lineno, colon_pos, lineno, colon_pos + 1))
 
-    def mutate(self, code):
-        tree = ASTParser.parse_to_tree(code)
-        if not tree:
-            return code
+    def apply_lines(self, context, site):
+        lines = context.lines
+        line_num = site.lineno - 1
+        colon_pos = site.col_offset
+        original_line = lines[line_num]
+        if site.mutate_type == 'CRemove':
+            mutated_line = original_line[:colon_pos] + original_line[colon_pos + 1:]
+            desc = f"Removed colon at line {line_num + 1}"
+        else:
+            mutated_line = original_line[:colon_pos] + ';' + original_line[colon_pos + 1:]
+            desc = f"Replaced colon with semicolon at line {line_num + 1}"
 
-        lines = code.splitlines()
-        for node in ast.walk(tree):
-            if isinstance(node, (ast.FunctionDef, ast.If, ast.For)):
-                line_num = node.lineno - 1
-                original_line = lines[line_num]
-                colon_pos = original_line.find(':', node.col_offset)
+        self.record_mutation(
+            mutator_type="ColonMutator",
+            mutate_type=site.mutate_type,
+            line_num=line_num + 1,
+            original_code=original_line,
+            mutated_code=mutated_line,
+            description=desc
+        )
+        self.successful = True
+        return {line_num: mutated_line}
 
-                if colon_pos != -1:
-                    mutation_type = self.select_mutation_type()
-                    if mutation_type == 'CRemove':
-                        mutated_line = original_line[:colon_pos] + original_line[colon_pos + 1:]
-                        desc = f"Removed colon at line {line_num + 1}"
-                    else:
-                        mutated_line = original_line[:colon_pos] + ';' + original_line[colon_pos + 1:]
-                        desc = f"Replaced colon with semicolon at line {line_num + 1}"
+    def collect_cst_sites(self, node, state, context):
+        colon = next((child for child in node.children if child.type == ':'), None)
+        if colon is not None and not colon.is_missing:
+            for mutation_type in self.get_mutate_types():
+                self.add_cst_site(state, mutation_type, colon)
 
-                    self.record_mutation(
-                        mutator_type="ColonMutator",
-                        mutate_type=mutation_type,
-                        line_num=line_num + 1,
-                        original_code=original_line,
-                        mutated_code=mutated_line,
-                        description=desc
-                    )
-                    self.successful = True
-                    lines[line_num] = mutated_line
-                    return '\n'.join(lines)
-        return code
\ No newline at end of file
+    def apply_cst(self, context, site):
+        (start, end), = site.path
+        if site.mutate_type == 'CRemove':
+            patches = [(start, end, '')]
+            desc = f"Removed colon at line {site.lineno}"
+        else:
+            patches = [(start, end, ';')]
+            desc = f"Replaced colon with semicolon at line {site.lineno}"
+        self.record_cst_mutation(context, site, patches, desc)
+        return patches
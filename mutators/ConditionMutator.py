@@ -1,15 +1,21 @@
 import ast
-import random
 from _ast import BoolOp, AST
 
-from ASTParser import  ASTParser
 from mutators.OperatorMutator import OperatorMutator  # 导入已有的操作符变异器
 
 
 class ConditionMutator(OperatorMutator):
+    SITE_NODES = (ast.If, ast.While)
+    CST_NODES = ('if_statement', 'elif_clause', 'while_statement')
+
     def __init__(self):
         super().__init__()
-        self.condition_nodes = []
+        self.boundary_map = {
+            ast.Lt: ast.LtE,
+            ast.LtE: ast.Lt,
+            ast.Gt: ast.GtE,
+            ast.GtE: ast.Gt
+        }
         self.mutate_types = [
             'CompareSubs',  # From CompareMutator
             'LogicOpReverse',
@@ -23,107 +29,83 @@ class ConditionMutator(OperatorMutator):
 
     def init(self):
         super().init()
-        self.condition_nodes = []
-
-    def can_mutate(self, code: str) -> bool:
-        tree = ASTParser.parse_to_tree(code)
-        if tree is None:
-            return False
-
-        self.condition_nodes = []
-        self._collect_conditions(tree)
-
-        if not self.condition_nodes:
-            return False
-
-        for node in self.condition_nodes:
-            test_node = node.test
-            if isinstance(test_node, ast.Compare):
-                for op in test_node.ops:
-                    if type(op) in self.operator_mapping:
-                        return True
-            elif isinstance(test_node, ast.BoolOp):
-                return True
-
-        return False
-
-    def mutate(self, code: str) -> str:
-        self.code_lines = code.split('\n')
-        tree = ASTParser.parse_to_tree(code)
-        if tree is None:
-            return code
-
-        self._collect_conditions(tree)
-        if not self.condition_nodes:
-            return code
-
-        target_node = random.choice(self.condition_nodes)
-        self.mutate_type = self.select_mutation_type()
-
-        outer_self = self
-
-        class ConditionTransformer(ast.NodeTransformer):
-            def visit_If(self, node):
-                return self._process_condition(node, node.test)
 
-            def visit_While(self, node):
-                return self._process_condition(node, node.test)
-
-            def _process_condition(self, node, test_node):
-                if node == target_node:
-                    original_code = ASTParser.tree_to_code(test_node)
-                    if not isinstance(test_node, ast.Compare):
-                        mutate_types = [m for m in outer_self.mutate_types if m != 'CompareSubs']
-                    else:
-                        mutate_types = outer_self.mutate_types
-                    random.shuffle(mutate_types)
-                    for mutate_type in mutate_types:
-                        outer_self.mutate_type = mutate_type
-                        if mutate_type == 'CompareSubs':
-                            new_test = outer_self._mutate_compare_op(test_node)
-                        else:
-                            new_test = outer_self._apply_custom_mutation(test_node, outer_self.mutate_type)
-                        if outer_self.successful:
-                            break
-
-                    mutated_code = ASTParser.tree_to_code(new_test)
-
-                    outer_self.record_mutation(
-                        mutator_type="ConditionMutator",
-                        mutate_type=outer_self.mutate_type,
-                        line_num=getattr(node, 'lineno', 0),
-                        original_code=original_code,
-                        mutated_code=mutated_code,
-                        description=f"{outer_self.mutate_type}: {original_code} → {mutated_code}"
-                    )
-                    outer_self.successful = True
-                    node.test = new_test
-                return node
-
-        mutated_tree = ConditionTransformer().visit(tree)
-        ast.fix_missing_locations(mutated_tree)
-        return ASTParser.tree_to_code(mutated_tree)
-
-    def _collect_conditions(self, node):
-
-        class ConditionCollector(ast.NodeVisitor):
-            def visit_If(self, node):
-                outer.condition_nodes.append(node)
-                self.generic_visit(node)
-
-            def visit_While(self, node):
-                outer.condition_nodes.append(node)
-                self.generic_visit(node)
-
-        outer = self
-        ConditionCollector().visit(node)
-
-    def _mutate_compare_op(self, test_node: ast.AST):
+    def collect_sites(self, node, path, state, context):
+        test_node = node.test
+        test_path = path + (('test', None),)
+        span = context.span(test_node)
         if isinstance(test_node, ast.Compare):
-            for i in range(len(test_node.ops)):
-                if type(test_node.ops[i]) in self.operator_mapping:
-                    return super()._mutate_comparison(test_node, i)
-        return test_node
+            mapped = [i for i, op in enumerate(test_node.ops) if type(op) in self.operator_mapping]
+            if not mapped:
+                return
+            self.add_site(state, 'CompareSubs', test_path, span, str(mapped[0]))
+            if len(test_node.ops) == 1 and type(test_node.ops[0]) in self.boundary_map:
+                self.add_site(state, 'BoundaryAdjust', test_path, span)
+        elif isinstance(test_node, ast.BoolOp):
+            self.add_site(state, 'LogicOpReverse', test_path, span)
+            self.add_site(state, 'PartialCondition', test_path, span)
+        else:
+            return
+        self.add_site(state, 'ConditionNegate', test_path, span)
+
+    def apply(self, editor, site, context):
+        self.mutate_type = site.mutate_type
+        test_node = editor.node(site.path)
+        if self.mutate_type == 'CompareSubs':
+            new_test = self._mutate_comparison(editor.touch(site.path), int(site.key), test_node)
+        elif self.mutate_type == 'BoundaryAdjust':
+            new_test = self._adjust_boundary(editor.touch(site.path))
+        else:
+            new_test = editor.replace(site.path, self._apply_custom_mutation(test_node, self.mutate_type))
+
+        mutate_type = self.mutate_type
+        self.record_mutation(
+            mutator_type="ConditionMutator",
+            mutate_type=mutate_type,
+            line_num=getattr(test_node, 'lineno', 0),
+            original_code=test_node,
+            mutated_code=new_test,
+            description=lambda: f"{mutate_type}: {ast.unparse(test_node)} → {ast.unparse(new_test)}"
+        )
+        self.successful = True
+
+    def collect_cst_sites(self, node, state, context):
+        test = node.child_by_field_name('condition')
+        if test is None:
+            return
+        operators = [(i, child) for i, child in enumerate(test.children) if not child.is_named]
+        if test.type == 'comparison_operator':
+            mapped = [(i, child) for i, child in operators if child.type in self.SYMBOL_TYPES]
+            if not mapped:
+                return
+            self.add_cst_site(state, 'CompareSubs', test, str(mapped[0][0]))
+            if len(operators) == 1 and self.SYMBOL_TYPES[mapped[0][1].type] in self.boundary_map:
+                self.add_cst_site(state, 'BoundaryAdjust', test, str(mapped[0][0]))
+        elif test.type == 'boolean_operator':
+            self.add_cst_site(state, 'LogicOpReverse', test, str(operators[0][0]))
+            self.add_cst_site(state, 'PartialCondition', test)
+        else:
+            return
+        self.add_cst_site(state, 'ConditionNegate', test)
+
+    def apply_cst(self, context, site):
+        test = context.node_at(site)
+        if site.mutate_type == 'ConditionNegate':
+            patches = [(test.start_byte, test.start_byte, 'not ('), (test.end_byte, test.end_byte, ')')]
+        elif site.mutate_type == 'PartialCondition':
+            operand = self.rng.choice([test.child_by_field_name('left'), test.child_by_field_name('right')])
+            patches = [(test.start_byte, test.end_byte, context.node_text(operand))]
+        else:
+            token = test.children[int(site.key)]
+            if site.mutate_type == 'LogicOpReverse':
+                new_op = 'or' if token.type == 'and' else 'and'
+            elif site.mutate_type == 'BoundaryAdjust':
+                new_op = self.OPERATOR_SYMBOLS[self.boundary_map[self.SYMBOL_TYPES[token.type]]]
+            else:
+                new_op = self.OPERATOR_SYMBOLS[self.rng.choice(self.operator_mapping[self.SYMBOL_TYPES[token.type]])]
+            patches = [(token.start_byte, token.end_byte, new_op)]
+        self.record_cst_mutation(context, site, patches, f"{site.mutate_type} at line {site.lineno}")
+        return patches
 
     def _apply_custom_mutation(self, node: ast.AST, mutation_type: str) -> ast.AST:
         if mutation_type == 'LogicOpReverse':
@@ -147,19 +129,13 @@ class ConditionMutator(OperatorMutator):
 
     def _adjust_boundary(self, node: ast.AST) -> ast.AST:
         if isinstance(node, ast.Compare) and len(node.ops) == 1:
-            self.successful = True
-            op_map = {
-                ast.Lt: ast.LtE,
-                ast.LtE: ast.Lt,
-                ast.Gt: ast.GtE,
-                ast.GtE: ast.Gt
-            }
-            if type(node.ops[0]) in op_map:
-                node.ops[0] = op_map[type(node.ops[0])]()
+            if type(node.ops[0]) in self.boundary_map:
+                self.successful = True
+                node.ops[0] = self.boundary_map[type(node.ops[0])]()
         return node
 
     def _simplify_condition(self, node: ast.AST) -> ast.AST:
         if isinstance(node, ast.BoolOp):
             self.successful = True
-            return random.choice(node.values)
+            return self.rng.choice(node.values)
         return node
\ No newline at end of file
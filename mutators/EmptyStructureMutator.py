@@ -1,30 +1,12 @@
 import ast
-import random
 from typing import List
 
-from ASTParser import ASTParser
 from mutators.BaseMutator import BaseMutator
 
 
-class CandidateCollector(ast.NodeVisitor):
-
-    def __init__(self, outer, candidates):
-        self.outer = outer
-        self.candidates = candidates
-
-    def visit_Assign(self, node):
-        if isinstance(node.value, (ast.List, ast.Dict, ast.Call)):
-            ori_type = type(node.value)
-            if ori_type in self.outer.STRUCTURE_MAP:
-                if ori_type == ast.Call:
-                    if isinstance(node.value.func, ast.Name) and node.value.func.id == 'set' and not node.value.args:
-                        self.candidates.append((node, ori_type))
-                elif ori_type == ast.List or ori_type == ast.Dict:
-                    self.candidates.append((node, ori_type))
-        self.generic_visit(node)
-
-
 class EmptyStructureMutator(BaseMutator):
+    SITE_NODES = (ast.Assign,)
+
     def __init__(self):
         super().__init__()
         self.STRUCTURE_MAP = {
@@ -39,47 +21,34 @@ class EmptyStructureMutator(BaseMutator):
     def get_mutate_types(self) -> List[str]:
         return ['EmptyInitSwap']
 
-    def can_mutate(self, code: str) -> bool:
-        tree = ASTParser.parse_to_tree(code)
-        if not tree:
-            return False
-
-        candidates = []
-
-        CandidateCollector(self, candidates).visit(tree)
-        return bool(candidates)
-
-    def mutate(self, code: str) -> str:
-        tree = ASTParser.parse_to_tree(code)
-        if not tree:
-            return code
-
-        candidates = []
-
-        CandidateCollector(self, candidates).visit(tree)
+    def collect_sites(self, node, path, state, context):
+        if isinstance(node.value, (ast.List, ast.Dict, ast.Call)):
+            ori_type = type(node.value)
+            if ori_type == ast.Call:
+                if not (isinstance(node.value.func, ast.Name) and node.value.func.id == 'set' and not node.value.args):
+                    return
+            self.add_site(state, 'EmptyInitSwap', path + (('value', None),), context.span(node.value),
+                          ori_type.__name__)
 
-        if not candidates:
-            return code
-        print(candidates)
-        target_node, original_type = random.choice(candidates)
-        original_node_code = ASTParser.tree_to_code(target_node)
-        new_type = random.choice(self.STRUCTURE_MAP[original_type])
+    def apply(self, editor, site, context):
+        target_node = editor.node(site.path[:-1])
+        original_type = getattr(ast, site.key)
+        new_type = self.rng.choice(self.STRUCTURE_MAP[original_type])
 
         if new_type == ast.Dict:
-            target_node.value = ast.Dict(keys=[], values=[])
+            new_value = ast.Dict(keys=[], values=[])
         elif new_type == ast.List:
-            target_node.value = ast.List(elts=[])
-        elif new_type == ast.Call:
-            target_node.value = ast.Call(func=ast.Name(id='set', ctx=ast.Load()), args=[], keywords=[])
+            new_value = ast.List(elts=[], ctx=ast.Load())
+        else:
+            new_value = ast.Call(func=ast.Name(id='set', ctx=ast.Load()), args=[], keywords=[])
+        editor.replace(site.path, new_value)
 
         self.record_mutation(
             mutator_type="EmptyStructureMutator",
             mutate_type="EmptyInitSwap",
             line_num=getattr(target_node, 'lineno', 0),
-            original_code=original_node_code,
-            mutated_code=ASTParser.tree_to_code(target_node),
+            original_code=target_node,
+            mutated_code=editor.node(site.path[:-1]),
             description=f"Changed {original_type.__name__} to {new_type.__name__}"
         )
         self.successful = True
-
-        return ASTParser.tree_to_code(tree)
@@ -1,28 +1,11 @@
 import ast
-import random
-from typing import Dict, List, Set
-from ASTParser import ASTParser
+from typing import Dict, List
 from mutators.BaseMutator import BaseMutator
 
 
-class FunctionCollector(ast.NodeVisitor):
-    def __init__(self):
-        self.defined_functions: Set[str] = set()
-        self.called_functions: Set[str] = set()
-
-    def visit_FunctionDef(self, node):
-        self.defined_functions.add(node.name)
-        self.generic_visit(node)
-
-    def visit_Call(self, node):
-        if isinstance(node.func, ast.Name):
-            self.called_functions.add(node.func.id)
-        elif isinstance(node.func, ast.Attribute):
-            self.called_functions.add(node.func.attr)
-        self.generic_visit(node)
-
-
 class FunctionMutator(BaseMutator):
+    SITE_NODES = (ast.Call,)
+
     def __init__(self):
         super().__init__()
 
@@ -40,53 +23,28 @@ class FunctionMutator(BaseMutator):
     def init(self):
         super().init()
 
-    def can_mutate(self, code: str) -> bool:
-        tree = ASTParser.parse_to_tree(code)
-        if tree is None:
-            return False
-
-        collector = FunctionCollector()
-        collector.visit(tree)
-
-        all_callable_functions = collector.called_functions.union(collector.defined_functions)
-        replaceable_funcs = [func for func in all_callable_functions if func in self.FUNCTION_REPLACEMENTS]
-        return bool(replaceable_funcs)
-
-    def mutate(self, code: str) -> str:
-        tree = ASTParser.parse_to_tree(code)
-        if tree is None:
-            return code
-
-        collector = FunctionCollector()
-        collector.visit(tree)
-
-        all_callable_functions = collector.called_functions.union(collector.defined_functions)
-
-        replaceable_funcs = [func for func in all_callable_functions if func in self.FUNCTION_REPLACEMENTS]
-        if not replaceable_funcs:
-            return code
-
-        old_func = random.choice(replaceable_funcs)
-        new_func = random.choice(self.FUNCTION_REPLACEMENTS[old_func])
-
-        outer_self = self
-        class FunctionRenamer(ast.NodeTransformer):
-            def visit_Call(self, node):
-                if isinstance(node.func, ast.Name) and node.func.id == old_func:
-                    original_code = f"{old_func}(...)"
-                    mutated_code = f"{new_func}(...)"
-                    node.func.id = new_func
-                    outer_self.record_mutation(
-                        mutator_type="FunctionMutator",
-                        mutate_type="FunctionReplace",
-                        line_num=getattr(node, 'lineno', 0),
-                        original_code=original_code,
-                        mutated_code=mutated_code,
-                        description=f"Replaced function call {old_func}() with {new_func}()"
-                    )
-                    outer_self.successful = True
-                return self.generic_visit(node)
-
-        mutated_tree = FunctionRenamer().visit(tree)
-        ast.fix_missing_locations(mutated_tree)
-        return ASTParser.tree_to_code(mutated_tree)
+    def collect_sites(self, node, path, state, context):
+        if isinstance(node.func, ast.Name) and node.func.id in self.FUNCTION_REPLACEMENTS:
+            seen = state.setdefault('seen', set())
+            if node.func.id not in seen:
+                seen.add(node.func.id)
+                self.add_site(state, 'FunctionReplace', path, context.span(node), node.func.id)
+
+    def apply(self, editor, site, context):
+        old_func = site.key
+        new_func = self.rng.choice(self.FUNCTION_REPLACEMENTS[old_func])
+
+        for node, path in editor.walk():
+            if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == old_func:
+                original_code = f"{old_func}(...)"
+                mutated_code = f"{new_func}(...)"
+                editor.touch(path + (('func', None),)).id = new_func
+                self.record_mutation(
+                    mutator_type="FunctionMutator",
+                    mutate_type="FunctionReplace",
+                    line_num=getattr(node, 'lineno', 0),
+                    original_code=original_code,
+                    mutated_code=mutated_code,
+                    description=f"Replaced function call {old_func}() with {new_func}()"
+                )
+                self.successful = True
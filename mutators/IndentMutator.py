@@ -1,9 +1,26 @@
-from ASTParser import ASTParser
+import ast
+
 from mutators.BaseMutator import BaseMutator
-import random
 
 
 class IndentMutator(BaseMutator):
+    """Re-indents the first line of one statement.
+
+    Sites are the statements of blocks with more than one statement, where a
+    changed indent no longer lines up with the neighbouring statements;
+    continuation lines and single-statement blocks could be re-indented into
+    valid code.  IRemove_space skips the last statement of a block, which would
+    simply join the enclosing block.  Before the site index only the first
+    indented line of the file was mutated.  IMix_tabs turns the first four
+    spaces of the indent into a tab, so the line mixes tabs and spaces with its
+    block (it used to leave the line unchanged).
+    """
+
+    TEXT_LEVEL = True
+    SITE_NODES = tuple(getattr(ast, name) for name in (
+        'FunctionDef', 'AsyncFunctionDef', 'ClassDef', 'For', 'AsyncFor', 'While', 'If', 'With', 'AsyncWith',
+        'Try', 'TryStar', 'ExceptHandler', 'match_case') if hasattr(ast, name))
+
     def __init__(self):
         super().__init__()
 
@@ -13,37 +30,53 @@ class IndentMutator(BaseMutator):
     def init(self):
         super().init()
 
-    def can_mutate(self, code: str) -> bool:
-        tree = ASTParser.parse_to_tree(code)
-        if tree is None:
-            return False
-        return True
-
-    def mutate(self, code) :
-        lines = code.splitlines()
-        for i, line in enumerate(lines):
-            if line.strip() and line[0] in (' ', '\t'):
-                mutation_type = self.select_mutation_type()
-                original_line = line
-                indent = len(line) - len(line.lstrip())
-                mutated_line = original_line
-                desc = ""
-                if mutation_type == 'IAdd_space':
-                    mutated_line = ' ' * (indent + 4) + line.lstrip()
-                    desc = f"Added 4 spaces at line {i + 1}"
-                elif mutation_type == 'IRemove_space':
-                    mutated_line = ' ' * max(0, indent - 4) + line.lstrip()
-                    desc = f"Removed 4 spaces at line {i + 1}"
-
-                self.record_mutation(
-                    mutator_type="IndentMutator",
-                    mutate_type=mutation_type,
-                    line_num=i + 1,
-                    original_code=original_line,
-                    mutated_code=mutated_line,
-                    description=desc
-                )
-                self.successful = True
-                lines[i] = mutated_line
-                return '\n'.join(lines)
-        return code
+    def collect_sites(self, node, path, state, context):
+        lines = state.setdefault('lines', {})
+        for field in ('body', 'orelse', 'finalbody'):
+            block = getattr(node, field, None)
+            if block and len(block) > 1:
+                for stmt in block:
+                    lines[stmt.lineno] = (stmt.col_offset, stmt is block[-1])
+
+    def finish_sites(self, state, context):
+        sites = []
+        for lineno, (col_offset, last) in sorted(state.get('lines', {}).items()):
+            line = context.lines[lineno - 1]
+            indent = len(line) - len(line.lstrip())
+            # Only statements that start their line (not the second of "a; b").
+            if indent == 0 or indent != col_offset:
+                continue
+            span = (lineno, 0, lineno, indent)
+            sites.append(('IAdd_space', (), span, ''))
+            if not last:
+                sites.append(('IRemove_space', (), span, ''))
+            if line.startswith('    '):
+                sites.append(('IMix_tabs', (), span, ''))
+        return sites
+
+    def apply_lines(self, context, site):
+        lines = context.lines
+        i = site.lineno - 1
+        original_line = line = lines[i]
+        indent = site.end_col_offset
+        mutation_type = site.mutate_type
+        if mutation_type == 'IAdd_space':
+            mutated_line = ' ' * (indent + 4) + line.lstrip()
+            desc = f"Added 4 spaces at line {i + 1}"
+        elif mutation_type == 'IRemove_space':
+            mutated_line = ' ' * max(0, indent - 4) + line.lstrip()
+            desc = f"Removed 4 spaces at line {i + 1}"
+        else:
+            mutated_line = '\t' + line[4:]
+            desc = f"Replaced 4 spaces with a tab at line {i + 1}"
+
+        self.record_mutation(
+            mutator_type="IndentMutator",
+            mutate_type=mutation_type,
+            line_num=i + 1,
+            original_code=original_line,
+            mutated_code=mutated_line,
+            description=desc
+        )
+        self.successful = True
+        return {i: mutated_line}
@@ -1,48 +1,11 @@
 import ast
-import random
-from typing import Dict, List, Set
-from ASTParser import ASTParser
+from typing import Dict, List
 from mutators.BaseMutator import BaseMutator
 
 
-class ModuleCollector(ast.NodeVisitor):
-    def __init__(self):
-        self.imported_modules: Set[str] = set()
-        self.used_modules: Dict[str, Set[str]] = {}
-        self.import_nodes = []
-
-    def visit_Import(self, node):
-        self.import_nodes.append(node)
-        for alias in node.names:
-            module_name = alias.name.split('.')[0]
-            self.imported_modules.add(module_name)
-            if alias.asname:
-                self.used_modules.setdefault(module_name, set()).add(alias.asname)
-            else:
-                self.used_modules.setdefault(module_name, set()).add(module_name.split('.')[0])
-        self.generic_visit(node)
-
-    def visit_ImportFrom(self, node):
-        self.import_nodes.append(node)
-        if node.module:
-            module_name = node.module.split('.')[0]
-            self.imported_modules.add(module_name)
-            for alias in node.names:
-                if alias.asname:
-                    self.used_modules.setdefault(module_name, set()).add(alias.asname)
-                else:
-                    self.used_modules.setdefault(module_name, set()).add(alias.name)
-        self.generic_visit(node)
-
-    def visit_Attribute(self, node):
-        if isinstance(node.value, ast.Name):
-            module_name = node.value.id
-            if module_name in self.imported_modules:
-                self.used_modules.setdefault(module_name, set()).add(module_name)
-        self.generic_visit(node)
-
-
 class ModuleMutator(BaseMutator):
+    SITE_NODES = (ast.Import, ast.ImportFrom)
+
     def __init__(self):
         super().__init__()
         self.MODULE_REPLACEMENTS: Dict[str, List[str]] = {
@@ -67,114 +30,83 @@ class ModuleMutator(BaseMutator):
     def get_mutate_types(self) -> List[str]:
         return ['ModuleReplace', 'ModuleRemove']
 
-    def mutate(self, code: str) -> str:
-        tree = ASTParser.parse_to_tree(code)
-        if tree is None:
-            return code
-
-        collector = ModuleCollector()
-        collector.visit(tree)
-
-        replaceable_modules = [
-            mod for mod in collector.imported_modules
-            if mod in self.MODULE_REPLACEMENTS
-        ]
-
-        if not replaceable_modules:
-            return code
-
-        mutation_type = random.choice(self.get_mutate_types())
-        old_module = random.choice(replaceable_modules)
-
-        if mutation_type == 'ModuleReplace':
-            return self._replace_module(tree, old_module, collector)
+    def collect_sites(self, node, path, state, context):
+        if isinstance(node, ast.Import):
+            modules = [alias.name.split('.')[0] for alias in node.names]
+        elif node.module:
+            modules = [node.module.split('.')[0]]
         else:
-            return self._remove_module(tree, old_module, collector)
-
-    def _replace_module(self, tree, old_module, collector):
-        new_module = random.choice(self.MODULE_REPLACEMENTS[old_module])
-        used_aliases = collector.used_modules.get(old_module, {old_module})
-
-        class ModuleRenamer(ast.NodeTransformer):
-            def visit_Import(self, node):
-                for alias in node.names:
-                    if alias.name.split('.')[0] == old_module:
-                        original_code = ASTParser.tree_to_code(node)
-                        alias.name = alias.name.replace(old_module, new_module, 1)
-
-                        outer_self.record_mutation(
-                            mutator_type="ModuleMutator",
-                            mutate_type="ModuleReplace",
-                            line_num=getattr(node, 'lineno', 0),
-                            original_code=original_code,
-                            mutated_code=ast.unparse(node),
-                            description=f"Replaced {old_module} with {new_module}"
-                        )
-                return node
-
-            def visit_ImportFrom(self, node):
+            return
+        seen = state.setdefault('seen', set())
+        for module_name in modules:
+            if module_name in self.MODULE_REPLACEMENTS and module_name not in seen:
+                seen.add(module_name)
+                for mutate_type in self.get_mutate_types():
+                    self.add_site(state, mutate_type, path, context.span(node), module_name)
+
+    def apply(self, editor, site, context):
+        if site.mutate_type == 'ModuleReplace':
+            self._replace_module(editor, site.key)
+        else:
+            self._remove_module(editor, site.key)
+
+    def _replace_module(self, editor, old_module):
+        new_module = self.rng.choice(self.MODULE_REPLACEMENTS[old_module])
+
+        for node, path in editor.walk():
+            if isinstance(node, ast.Import):
+                if any(alias.name.split('.')[0] == old_module for alias in node.names):
+                    original = node
+                    node = editor.touch(path)
+                    for alias in node.names:
+                        if alias.name.split('.')[0] == old_module:
+                            alias.name = alias.name.replace(old_module, new_module, 1)
+                            self._record_replace(node, original, old_module, new_module)
+            elif isinstance(node, ast.ImportFrom):
                 if node.module and node.module.split('.')[0] == old_module:
-                    original_code = ASTParser.tree_to_code(node)
+                    original = node
+                    node = editor.touch(path)
                     node.module = node.module.replace(old_module, new_module, 1)
-
-                    outer_self.record_mutation(
-                        mutator_type="ModuleMutator",
-                        mutate_type="ModuleReplace",
-                        line_num=getattr(node, 'lineno', 0),
-                        original_code=original_code,
-                        mutated_code=ast.unparse(node),
-                        description=f"Replaced {old_module} with {new_module}"
-                    )
-                return node
-
-        outer_self = self
-        mutated_tree = ModuleRenamer().visit(tree)
-        ast.fix_missing_locations(mutated_tree)
-        return ASTParser.tree_to_code(mutated_tree)
-
-    def _remove_module(self, tree, module_to_remove, collector):
-        class ModuleRemover(ast.NodeTransformer):
-            def visit_Import(self, node):
+                    self._record_replace(node, original, old_module, new_module)
+
+    def _record_replace(self, node, original, old_module, new_module):
+        self.record_mutation(
+            mutator_type="ModuleMutator",
+            mutate_type="ModuleReplace",
+            line_num=getattr(node, 'lineno', 0),
+            original_code=original,
+            mutated_code=node,
+            description=f"Replaced {old_module} with {new_module}"
+        )
+        self.successful = True
+
+    def _remove_module(self, editor, module_to_remove):
+        for node, path in editor.walk():
+            if isinstance(node, ast.Import):
                 new_names = [alias for alias in node.names if alias.name.split('.')[0] != module_to_remove]
                 if new_names != node.names:
-                    outer_self.record_mutation(
+                    self.record_mutation(
                         mutator_type="ModuleMutator",
                         mutate_type="ModuleRemove",
                         line_num=getattr(node, 'lineno', 0),
-                        original_code=ast.unparse(node),
-                        mutated_code=ast.unparse(ast.Import(names=new_names)) if new_names else "",
+                        original_code=node,
+                        mutated_code=ast.Import(names=new_names) if new_names else "",
                         description=f"Removed {module_to_remove} from import"
                     )
-                return ast.Import(names=new_names) if new_names else None
-
-            def visit_ImportFrom(self, node):
+                    self.successful = True
+                    if new_names:
+                        editor.touch(path).names = new_names
+                    else:
+                        editor.remove(path)
+            elif isinstance(node, ast.ImportFrom):
                 if node.module and node.module.split('.')[0] == module_to_remove:
-                    outer_self.record_mutation(
+                    self.record_mutation(
                         mutator_type="ModuleMutator",
                         mutate_type="ModuleRemove",
                         line_num=getattr(node, 'lineno', 0),
-                        original_code=ast.unparse(node),
+                        original_code=node,
                         mutated_code="",
                         description=f"Removed {module_to_remove} import"
                     )
-                    return None
-                return node
-
-        outer_self = self
-        mutated_tree = ModuleRemover().visit(tree)
-        ast.fix_missing_locations(mutated_tree)
-        return ASTParser.tree_to_code(mutated_tree)
-
-    def can_mutate(self, code: str) -> bool:
-        tree = ASTParser.parse_to_tree(code)
-        if tree is None:
-            return False
-
-        collector = ModuleCollector()
-        collector.visit(tree)
-
-        replaceable_modules = [
-            mod for mod in collector.imported_modules
-            if mod in self.MODULE_REPLACEMENTS
-        ]
-        return bool(replaceable_modules)
\ No newline at end of file
+                    self.successful = True
+                    editor.remove(path)
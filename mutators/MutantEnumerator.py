@@ -0,0 +1,129 @@
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple
+
+from ASTParser import AnalysisContext
+from SiteIndex import MutationSite
+from mutators.BaseMutator import log_apply_error
+
+
+class ScriptedRandom:
+    """Stand-in for random.Random that makes each draw a scripted index.
+
+    Draws beyond the end of the script take option 0.  ``trace`` holds the index
+    taken at every draw and ``branching`` the number of options it had, which is
+    all that is needed to step to the next combination of choices.
+    """
+
+    def __init__(self, script=()):
+        self.script = list(script)
+        self.trace = []
+        self.branching = []
+
+    def _pick(self, n: int) -> int:
+        pos = len(self.trace)
+        index = self.script[pos] if pos < len(self.script) else 0
+        self.trace.append(index)
+        self.branching.append(n)
+        return index
+
+    def choice(self, seq):
+        return seq[self._pick(len(seq))]
+
+    def randint(self, a: int, b: int) -> int:
+        return a + self._pick(b - a + 1)
+
+    def choices(self, population, weights=None, *, cum_weights=None, k=1):
+        if k != 1:
+            raise ValueError("ScriptedRandom only scripts single draws")
+        if cum_weights is not None:
+            weights = [w - prev for prev, w in zip([0] + list(cum_weights), cum_weights)]
+        options = list(population)
+        if weights is not None and any(w > 0 for w in weights):
+            options = [item for item, w in zip(population, weights) if w > 0]
+        return [self.choice(options)]
+
+    def next_script(self) -> Optional[list]:
+        """The script of the next combination in odometer order, or None after the last one."""
+        for pos in range(len(self.trace) - 1, -1, -1):
+            if self.trace[pos] + 1 < self.branching[pos]:
+                return self.trace[:pos] + [self.trace[pos] + 1]
+        return None
+
+
+@dataclass(frozen=True)
+class EnumeratedMutant:
+    site: MutationSite
+    operator: str
+    replacement: Tuple[int, ...]
+    mutated_code: str
+    mutated_info: str
+
+
+class MutantEnumeration:
+    """Every first-order mutant of one program, as (site, operator, replacement).
+
+    The replacement is the tuple of choices a mutator makes while applying a site
+    (which operator, name, bracket, shift ...).  Building the enumeration runs each
+    mutator's edit without rendering it, so ``len()`` is known before any mutant
+    is produced; iteration then renders mutants one at a time, in a fixed order,
+    and can start at any position to split or resume a run.  Applies that raise
+    are logged and counted in ``failures``.
+    """
+
+    def __init__(self, code: str, mutators: list, context: AnalysisContext = None):
+        self.failures = 0
+        self.context = context if context is not None and context.matches(code) else AnalysisContext(code)
+        self.mutators = {type(m).__name__: m for m in mutators}
+        if self.context.sites is None:
+            self.context.index_sites(mutators)
+        self.plan: List[Tuple[MutationSite, tuple]] = []
+        for site in self.context.sites.sites:
+            mutator = self.mutators.get(site.mutator)
+            if mutator is not None:
+                self.plan.extend((site, script) for script in self._scripts(mutator, site))
+
+    def __len__(self):
+        return len(self.plan)
+
+    def __iter__(self) -> Iterator[EnumeratedMutant]:
+        return self.iter(0)
+
+    def iter(self, start: int = 0, stop: int = None) -> Iterator[EnumeratedMutant]:
+        for site, script in self.plan[start:stop]:
+            yield self._render(self.mutators[site.mutator], site, script)
+
+    def _scripts(self, mutator, site):
+        script = []
+        while script is not None:
+            rng = ScriptedRandom(script)
+            if self._run(mutator, site, rng, lambda: self._dry_apply(mutator, site))[0]:
+                yield tuple(rng.trace)
+            script = rng.next_script()
+
+    def _dry_apply(self, mutator, site):
+        if mutator.TEXT_LEVEL:
+            changes = mutator.apply_lines(self.context, site)
+            if not mutator.breaks_syntax(self.context, changes):
+                mutator.init()
+            return changes
+        return mutator.apply(self.context.editor(), site, self.context)
+
+    def _render(self, mutator, site, script) -> EnumeratedMutant:
+        _, code = self._run(mutator, site, ScriptedRandom(script), lambda: mutator.apply_site(self.context, site))
+        info = str(mutator.mutation_record) if mutator.successful else ''
+        mutator.init()
+        return EnumeratedMutant(site, site.mutate_type, script, code, info)
+
+    def _run(self, mutator, site, rng, action):
+        """Run ``action`` with ``rng`` injected; returns (mutator.successful, result)."""
+        saved, mutator.rng = mutator.rng, rng
+        mutator.init()
+        try:
+            result = action()
+            return mutator.successful, result
+        except Exception as e:
+            self.failures += 1
+            log_apply_error(mutator, e, site)
+            return False, None
+        finally:
+            mutator.rng = saved
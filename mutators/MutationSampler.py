@@ -0,0 +1,134 @@
+from collections import Counter
+from typing import List, Optional, Tuple
+
+from config import CONFIG
+from mutators import registry
+
+
+class AliasTable:
+    """Vose's alias method: O(n) construction, O(1) draws from a discrete distribution."""
+
+    def __init__(self, weights: List[float]):
+        n = len(weights)
+        total = sum(weights)
+        scaled = [w * n / total for w in weights]
+        self.prob = [1.0] * n
+        self.alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1]
+        large = [i for i, p in enumerate(scaled) if p >= 1]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1 - scaled[s]
+            (small if scaled[l] < 1 else large).append(l)
+
+    def __len__(self):
+        return len(self.prob)
+
+    def sample(self, rng) -> int:
+        i = int(rng.random() * len(self.prob))
+        return i if rng.random() < self.prob[i] else self.alias[i]
+
+
+class MutationSampler:
+    """Draws mutation chains for one original so that realized errors follow CONFIG.MUTATION_RATE.
+
+    Weights are restricted to the mutators applicable to the original, so no draw
+    is spent on a mutator without sites or on the empty slot.  A step that cannot
+    be realized in its chain is retried with another mutator of the same level
+    (AST or text), within ``retry_budget`` retries per chain.  Every draw uses the
+    sample's own generator, and the ordinals handed to the executor start at the
+    sample index, so sample k depends only on the original's content and k and
+    can be rebuilt without running samples 0..k-1.
+
+    With ``rate_correction`` (default CONFIG.SAMPLER_RATE_CORRECTION) the
+    realized share of each mutator is compared with its target share after every
+    sample and the weights are corrected, so the rates of an original's samples
+    converge to the configured ones.  Sample k then also depends on what the
+    samples before it realized, and can only be rebuilt by replaying them.
+
+    With a ChainPlanner, each drawn chain is ordered and fitted to the original's
+    sites before it is returned.
+    """
+
+    # A mutator realized less often than its target share gets its weight scaled
+    # by (expected / realized) ** CORRECTION_GAIN, within [1/MAX, MAX].
+    CORRECTION_GAIN = 4
+    MAX_CORRECTION = 4.0
+
+    def __init__(self, available: list, retry_budget: Optional[int] = None, planner=None,
+                 rate_correction: Optional[bool] = None):
+        self.available = available
+        self.planner = planner
+        self.rate_correction = CONFIG.SAMPLER_RATE_CORRECTION if rate_correction is None else rate_correction
+        rates = [registry.rate(type(m).__name__) for m in available]
+        total = sum(rates)
+        self.target = {type(m).__name__: rate / total for m, rate in zip(available, rates)} if total else {}
+        self.retry_budget = CONFIG.SAMPLER_RETRY_BUDGET if retry_budget is None else retry_budget
+        max_times = min(len(CONFIG.MUTATION_TIMES_RATE), len(available))
+        self.times = AliasTable(CONFIG.MUTATION_TIMES_RATE[:max_times]) if max_times else None
+        self.realized = Counter()
+        self.weights = dict(self.target)
+        self.table = self._table(available)
+        self._rng = None
+        self._retries = 0
+        self._base = 0
+        self._uses = Counter()
+
+    def _table(self, mutators) -> Optional[AliasTable]:
+        weights = [self.weights[type(m).__name__] for m in mutators]
+        return AliasTable(weights) if sum(weights) > 0 else None
+
+    def _ordinal(self, mutator) -> int:
+        # The k-th use of a mutator in sample i gets ordinal i + k: successive samples
+        # walk through its seeded site order without knowing what earlier ones did.
+        name = type(mutator).__name__
+        self._uses[name] += 1
+        return self._base + self._uses[name] - 1
+
+    def draw_chain(self, rng, sample_index: int = 0) -> Tuple[int, list, list]:
+        """Returns (chain length, mutators, ordinals) for sample ``sample_index``."""
+        self._rng = rng
+        self._retries = 0
+        self._base = sample_index
+        self._uses = Counter()
+        if self.times is None or self.table is None:
+            return 0, [], []
+        time = self.times.sample(rng)
+        chain = [self.available[self.table.sample(rng)] for _ in range(time)]
+        if self.planner is not None:
+            chain = self.planner.plan(chain, rng, self._redraw, sample_index)
+        return time, chain, [self._ordinal(m) for m in chain]
+
+    def _redraw(self, candidates, rng):
+        table = self._table(candidates)
+        return candidates[table.sample(rng)] if table is not None else None
+
+    def retry(self, failed, tried=()) -> Optional[tuple]:
+        """A substitute (mutator, ordinal) of the same level as ``failed``, or None once the budget is spent."""
+        if self._retries >= self.retry_budget:
+            return None
+        excluded = {type(failed).__name__} | {type(m).__name__ for m in tried}
+        candidates = [m for m in self.available
+                      if m.TEXT_LEVEL == failed.TEXT_LEVEL and type(m).__name__ not in excluded]
+        substitute = self._redraw(candidates, self._rng) if candidates else None
+        if substitute is None:
+            return None
+        self._retries += 1
+        return substitute, self._ordinal(substitute)
+
+    def update(self, realized: list):
+        """Feed back one sample's single_Info records and, with rate_correction, correct the weights."""
+        if not self.rate_correction:
+            return
+        for record in realized:
+            self.realized[record['mutator_type']] += 1
+        total = sum(self.realized.values())
+        if not total:
+            return
+        for name, share in self.target.items():
+            correction = ((share * total + 1) / (self.realized[name] + 1)) ** self.CORRECTION_GAIN
+            correction = min(max(correction, 1 / self.MAX_CORRECTION), self.MAX_CORRECTION)
+            self.weights[name] = share * correction
+        self.table = self._table(self.available)
@@ -1,12 +1,24 @@
 import ast
-import copy
-import random
 
-from ASTParser import ASTParser
 from mutators.BaseMutator import BaseMutator
 
 
 class OperatorMutator(BaseMutator):
+    """Swaps one arithmetic or comparison operator.
+
+    Each BinOp and each operator of a Compare is a site and a mutation changes
+    exactly one of them; before the site index a mutation rewrote every
+    outermost BinOp (or the first operator of every outermost Compare) in the
+    file at once.
+    """
+
+    SITE_NODES = (ast.BinOp, ast.Compare)
+    CST_NODES = ('binary_operator', 'comparison_operator')
+    OPERATOR_SYMBOLS = {
+        ast.Add: '+', ast.Sub: '-', ast.Mult: '*', ast.Div: '/', ast.FloorDiv: '//', ast.Mod: '%', ast.Pow: '**',
+        ast.Eq: '==', ast.NotEq: '!=', ast.Lt: '<', ast.LtE: '<=', ast.Gt: '>', ast.GtE: '>='
+    }
+    SYMBOL_TYPES = {symbol: op_type for op_type, symbol in OPERATOR_SYMBOLS.items()}
 
     def __init__(self):
         super().__init__()
@@ -42,59 +54,27 @@ class OperatorMutator(BaseMutator):
         self.find_Compare = False
         self.code_lines = []
 
-    def can_mutate(self, code: str) -> bool:
-        tree = ASTParser.parse_to_tree(code)
-        if tree is None:
-            return False
-
-        class OperatorFinder(ast.NodeVisitor):
-            def __init__(self):
-                self.found = False
-
-            def visit_BinOp(self, node):
-                if type(node.op) in self.operator_mapping:
-                    self.found = True
-                self.generic_visit(node)
-
-            def visit_Compare(self, node):
-                for op in node.ops:
-                    if type(op) in self.operator_mapping:
-                        self.found = True
-                self.generic_visit(node)
-
-        finder = OperatorFinder()
-        finder.operator_mapping = self.operator_mapping
-        finder.visit(tree)
-        return finder.found
-
-    def mutate(self, code: str) -> str:
-        tree = ASTParser.parse_to_tree(code)
-
-        outer_self = self
-
-        self.mutate_type = self.select_mutation_type()
-
-        class OperatorTransformer(ast.NodeTransformer):
-            def visit_BinOp(self, node):
-                if outer_self.mutate_type == 'BinOpSubs':
-                    if type(node.op) in outer_self.operator_mapping:
-                        return outer_self._mutate_operator(node)
-                return node
-
-            def visit_Compare(self, node):
-                if outer_self.mutate_type == 'CompareSubs':
-                    for i, op in enumerate(node.ops):
-                        if type(op) in outer_self.operator_mapping:
-                            return outer_self._mutate_comparison(node, i)
-                return node
-
-        mutated = OperatorTransformer().visit(tree)
-        return ASTParser.tree_to_code(mutated)
-
-    def _mutate_operator(self, node: ast.BinOp) -> ast.BinOp:
-        original_code = ASTParser.tree_to_code(node)
+    def collect_sites(self, node, path, state, context):
+        if isinstance(node, ast.BinOp):
+            if type(node.op) in self.operator_mapping:
+                self.add_site(state, 'BinOpSubs', path, context.span(node))
+        else:
+            for i, op in enumerate(node.ops):
+                if type(op) in self.operator_mapping:
+                    self.add_site(state, 'CompareSubs', path, context.span(node), str(i))
+
+    def apply(self, editor, site, context):
+        self.mutate_type = site.mutate_type
+        original = editor.node(site.path)
+        node = editor.touch(site.path)
+        if site.mutate_type == 'BinOpSubs':
+            self._mutate_operator(node, original)
+        else:
+            self._mutate_comparison(node, int(site.key), original)
+
+    def _mutate_operator(self, node: ast.BinOp, original: ast.BinOp) -> ast.BinOp:
         original_op = type(node.op).__name__
-        new_op_type = random.choice(self.operator_mapping[type(node.op)])
+        new_op_type = self.rng.choice(self.operator_mapping[type(node.op)])
         node.op = new_op_type()
 
         self.successful = True
@@ -102,17 +82,16 @@ class OperatorMutator(BaseMutator):
             mutator_type="OperatorMutator",
             mutate_type=self.mutate_type,
             line_num=getattr(node, 'lineno', 0),
-            original_code=original_code,
-            mutated_code=ASTParser.tree_to_code(node),
+            original_code=original,
+            mutated_code=node,
             description=f"Replaced {original_op} with {new_op_type.__name__} in binary operation"
         )
         self._mutation_applied = True
         return node
 
-    def _mutate_comparison(self, node: ast.Compare, op_index: int) -> ast.Compare:
-        original_code = ASTParser.tree_to_code(node)
+    def _mutate_comparison(self, node: ast.Compare, op_index: int, original: ast.Compare) -> ast.Compare:
         original_op = type(node.ops[op_index]).__name__
-        new_op_type = random.choice(self.operator_mapping[type(node.ops[op_index])])
+        new_op_type = self.rng.choice(self.operator_mapping[type(node.ops[op_index])])
         node.ops[op_index] = new_op_type()
 
         self.successful = True
@@ -120,9 +99,23 @@ class OperatorMutator(BaseMutator):
             mutator_type="OperatorMutator",
             mutate_type=self.mutate_type,
             line_num=getattr(node, 'lineno', 0),
-            original_code=original_code,
-            mutated_code=ASTParser.tree_to_code(node),
+            original_code=original,
+            mutated_code=node,
             description=f"Replaced {original_op} with {new_op_type.__name__} in comparison"
         )
         self._mutation_applied = True
         return node
+
+    def collect_cst_sites(self, node, state, context):
+        mutate_type = 'BinOpSubs' if node.type == 'binary_operator' else 'CompareSubs'
+        for child in node.children:
+            if not child.is_named and child.type in self.SYMBOL_TYPES:
+                self.add_cst_site(state, mutate_type, child, child.type)
+
+    def apply_cst(self, context, site):
+        token = context.node_at(site)
+        new_op_type = self.rng.choice(self.operator_mapping[self.SYMBOL_TYPES[site.key]])
+        patches = [(token.start_byte, token.end_byte, self.OPERATOR_SYMBOLS[new_op_type])]
+        self.record_cst_mutation(context, site, patches,
+                                 f"Replaced {self.SYMBOL_TYPES[site.key].__name__} with {new_op_type.__name__}")
+        return patches
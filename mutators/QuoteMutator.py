@@ -1,9 +1,22 @@
+import ast
+
 from mutators.BaseMutator import BaseMutator
-import re
-import random
 
 
 class QuoteMutator(BaseMutator):
+    """Breaks the quoting of one line that holds string literals.
+
+    Before the site index only the first line containing a quote character
+    (comments included) was mutated; now every line with a string literal is a
+    site.  QSingle_to_double is offered only on lines with a single-quoted
+    literal, where it changes something, and QEscape_remove drops the backslash
+    of the line's first escape sequence whose removal leaves an invalid literal,
+    such as the one in front of an escaped quote (it used to leave the line
+    unchanged; dropping the one of ``\\n`` would just give ``n``).
+    """
+
+    TEXT_LEVEL = True
+
     def __init__(self):
         super().__init__()
 
@@ -13,38 +26,69 @@ class QuoteMutator(BaseMutator):
     def init(self):
         super().init()
 
-    def mutate(self, code: str) -> str:
-        lines = code.splitlines()
-        for i, line in enumerate(lines):
-            if '"' in line or "'" in line:
-                quote_pos = max(line.find('"'), line.find("'"))
-                if quote_pos == -1:
-                    continue
-
-                mutation_type = self.select_mutation_type()
-                original_line = line
-
-                mutated_line = original_line
-                desc = ""
-
-                if mutation_type == 'QSingle_to_double':
-                    mutated_line = line.replace("'", '"')
-                    desc = f"Changed single to double quotes at line {i + 1}"
-                elif mutation_type == 'QUnterminated':
-                    mutated_line = line[:quote_pos] + line[quote_pos + 1:]
-                    desc = f"Removed opening quote at line {i + 1}"
-                self.record_mutation(
-                    mutator_type="QuoteMutator",
-                    mutate_type=mutation_type,
-                    line_num=i + 1,
-                    original_code=original_line,
-                    mutated_code=mutated_line,
-                    description=desc
-                )
-                self.successful = True
-                lines[i] = mutated_line
-                return '\n'.join(lines)
-        return code
-
-    def can_mutate(self, code: str) -> bool:
-        return '"' in code or "'" in code
\ No newline at end of file
+    def finish_sites(self, state, context):
+        # One site per line holding string literals, at the opening quote of the
+        # first one; quotes in comments are not string literals and are skipped.
+        lines = {}
+        escapes = {}
+        for (lineno, col), _, text in context.token_index.strings:
+            prefix = len(text) - len(text.lstrip('rRbBuUfF'))
+            quote_pos = col + prefix
+            first, single = lines.get(lineno, (quote_pos, False))
+            lines[lineno] = (first, single or text[prefix] == "'")
+            backslash = self._breaking_escape(text, prefix)
+            if backslash is not None:
+                before = text[:backslash]
+                line = lineno + before.count('\n')
+                escape_pos = backslash - before.rfind('\n') - 1 if '\n' in before else col + backslash
+                escapes.setdefault(line, escape_pos)
+        sites = []
+        for lineno, (quote_pos, single) in lines.items():
+            span = (lineno, quote_pos, lineno, quote_pos + 1)
+            if single:
+                sites.append(('QSingle_to_double', (), span, ''))
+            sites.append(('QUnterminated', (), span, ''))
+        for lineno, escape_pos in escapes.items():
+            sites.append(('QEscape_remove', (), (lineno, escape_pos, lineno, escape_pos + 1), ''))
+        return sites
+
+    @staticmethod
+    def _breaking_escape(text: str, prefix: int):
+        """Offset in the literal ``text`` of the first escape backslash whose removal makes it invalid, or None."""
+        if 'r' in text[:prefix].lower():
+            return None
+        i = text.find('\\', prefix)
+        while i != -1:
+            try:
+                ast.parse(text[:i] + text[i + 1:], mode='eval')
+            except (SyntaxError, ValueError):
+                return i
+            i = text.find('\\', i + 2)
+        return None
+
+    def apply_lines(self, context, site):
+        lines = context.lines
+        i = site.lineno - 1
+        quote_pos = site.col_offset
+        line = original_line = lines[i]
+        mutation_type = site.mutate_type
+
+        if mutation_type == 'QSingle_to_double':
+            mutated_line = line.replace("'", '"')
+            desc = f"Changed single to double quotes at line {i + 1}"
+        elif mutation_type == 'QUnterminated':
+            mutated_line = line[:quote_pos] + line[quote_pos + 1:]
+            desc = f"Removed opening quote at line {i + 1}"
+        else:
+            mutated_line = line[:quote_pos] + line[quote_pos + 1:]
+            desc = f"Removed escape backslash at line {i + 1}"
+        self.record_mutation(
+            mutator_type="QuoteMutator",
+            mutate_type=mutation_type,
+            line_num=i + 1,
+            original_code=original_line,
+            mutated_code=mutated_line,
+            description=desc
+        )
+        self.successful = True
+        return {i: mutated_line}
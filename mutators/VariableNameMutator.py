@@ -1,72 +1,66 @@
 import builtins
 import keyword
 import ast
-import random
-import difflib
+import itertools
 import string
 
 from ASTParser import ASTParser
+from SiteIndex import source_hash
 from mutators.BaseMutator import BaseMutator
 
 
-class VariableCollector(ast.NodeVisitor):
-    def __init__(self):
-        self.excluded_names = set()
-        self.variables = set()
-        self.function_names = set()
-        self.class_names = set()
-        self.builtins = set(dir(builtins))
-
-    def visit_FunctionDef(self, node):
-        self.function_names.add(node.name)
-        self.generic_visit(node)
-
-    def visit_ClassDef(self, node):
-        self.class_names.add(node.name)
-        self.generic_visit(node)
-
-    def visit_Import(self, node):
-        for alias in node.names:
-            self.excluded_names.add(alias.name)
-
-    def visit_Name(self, node):
-        if (
-                isinstance(node.ctx, (ast.Store, ast.Load))
-                and not keyword.iskeyword(node.id)
-                and node.id not in self.function_names
-                and node.id not in self.class_names
-                and node.id not in self.builtins
-                and node.id not in self.excluded_names
-
-        ):
-            self.variables.add(node.id)
-
-
-def get_renew_variable(old_var):
-    chars = string.ascii_letters + string.digits
-    return old_var + random.choice(chars)
-
-
-def get_weighted_random_variable(old_var, candidates):
+def get_renew_variable(old_var, rng):
+    chars = [c for c in string.ascii_letters + string.digits if not keyword.iskeyword(old_var + c)]
+    return old_var + rng.choice(chars)
+
+
+def name_similarity(a, b):
+    """2 * LCS / total length, the ratio difflib approximates, with a bit-parallel LCS (Hyyro 2004)."""
+    if not a or not b:
+        return 0.0
+    masks = {}
+    for i, ch in enumerate(a):
+        masks[ch] = masks.get(ch, 0) | (1 << i)
+    full = (1 << len(a)) - 1
+    v = full
+    for ch in b:
+        u = v & masks.get(ch, 0)
+        v = ((v + u) | (v - u)) & full
+    lcs = len(a) - bin(v).count('1')
+    return 2 * lcs / (len(a) + len(b))
+
+
+def similarity_table(names):
+    """For every name: the other names and their cumulative similarity weights, ready for rng.choices."""
+    similarity = {}
+    for i, a in enumerate(names):
+        for b in names[i + 1:]:
+            similarity[a, b] = similarity[b, a] = name_similarity(a, b)
+    table = {}
+    for a in names:
+        candidates = [b for b in names if b != a]
+        weights = [similarity[a, b] for b in candidates]
+        if not any(weights):
+            weights = [1] * len(candidates)
+        table[a] = (candidates, list(itertools.accumulate(weights)))
+    return table
+
+
+def get_weighted_random_variable(old_var, table, rng):
+    candidates, cum_weights = table.get(old_var, ((), ()))
     if not candidates:
-        return get_renew_variable(old_var)
-    similarity_scores = [
-        difflib.SequenceMatcher(None, old_var, var).ratio()
-        for var in candidates
-    ]
-    total = sum(similarity_scores)
-    if total == 0:
-        similarity_scores = [1 / len(candidates)] * len(candidates)
-    else:
-        similarity_scores = [score / total for score in similarity_scores]
-
-    new_var = random.choices(candidates, weights=similarity_scores, k=1)[0]
-    return new_var
+        return get_renew_variable(old_var, rng)
+    return rng.choices(candidates, cum_weights=cum_weights, k=1)[0]
 
 
 class VariableNameMutator(BaseMutator):
+    SITE_NODES = (ast.FunctionDef, ast.ClassDef, ast.Import, ast.Name)
+
     def __init__(self):
         super().__init__()
+        self.builtins = set(dir(builtins))
+        # (source hash, similarity_table) of the last original; its samples arrive together.
+        self._similarity = (None, {})
 
     def init(self):
         super().init()
@@ -74,43 +68,61 @@ class VariableNameMutator(BaseMutator):
     def get_mutate_types(self):
         return ['VRenew', 'VReplace']
 
-    def select_mutation_type(self):
-        rate = [0.1, 0.9]
-        return random.choices(self.get_mutate_types(), weights=rate, k=1)[0]
-
-    def can_mutate(self, code: str) -> bool:
-        tree = ASTParser.parse_to_tree(code)
-        if tree is None:
-            return False
-
-        collector = VariableCollector()
-        collector.visit(tree)
-        return bool(collector.variables)
-
-    def mutate(self, code: str) -> str:
-        tree = ASTParser.parse_to_tree(code)
-        collector = VariableCollector()
-        collector.visit(tree)
-        variables = list(collector.variables)
-        if not variables:
-            return code
-
-        old_var = random.choice(variables)
-        mutate_type = self.select_mutation_type()
-
-        if mutate_type == 'renew':
-            new_var = get_renew_variable(old_var)
+    def type_weights(self, mutate_types):
+        rate = {'VRenew': 0.1, 'VReplace': 0.9}
+        return [rate[t] for t in mutate_types]
+
+    def select_mutation_type(self, mutate_types=None):
+        mutate_types = mutate_types or self.get_mutate_types()
+        return self.rng.choices(mutate_types, weights=self.type_weights(mutate_types), k=1)[0]
+
+    def collect_sites(self, node, path, state, context):
+        if isinstance(node, ast.FunctionDef):
+            state.setdefault('function_names', set()).add(node.name)
+        elif isinstance(node, ast.ClassDef):
+            state.setdefault('class_names', set()).add(node.name)
+        elif isinstance(node, ast.Import):
+            for alias in node.names:
+                state.setdefault('excluded_names', set()).add(alias.name)
+        elif (
+                isinstance(node.ctx, (ast.Store, ast.Load))
+                and not keyword.iskeyword(node.id)
+                and node.id not in state.get('function_names', ())
+                and node.id not in state.get('class_names', ())
+                and node.id not in self.builtins
+                and node.id not in state.get('excluded_names', ())
+        ):
+            state.setdefault('variables', {}).setdefault(node.id, (path, context.span(node)))
+
+    def finish_sites(self, state, context):
+        variables = state.get('variables', {})
+        sites = []
+        for name, (path, span) in variables.items():
+            sites.append(('VRenew', path, span, name))
+            if len(variables) > 1:
+                sites.append(('VReplace', path, span, name))
+        return sites
+
+    def get_similarity_table(self, context):
+        code_hash = context.sites.code_hash if context.sites is not None else source_hash(context.source)
+        if self._similarity[0] != code_hash:
+            names = [site.key for site in self.find_sites(context) if site.mutate_type == 'VRenew']
+            self._similarity = (code_hash, similarity_table(names))
+        return self._similarity[1]
+
+    def apply(self, editor, site, context):
+        old_var = site.key
+        mutate_type = site.mutate_type
+
+        if mutate_type == 'VRenew':
+            new_var = get_renew_variable(old_var, self.rng)
         else:
-            candidates = [v for v in variables if v != old_var]
-            new_var = get_weighted_random_variable(old_var, candidates)
-
-        outer_self = self
+            new_var = get_weighted_random_variable(old_var, self.get_similarity_table(context), self.rng)
 
-        class VariableRenamer(ast.NodeTransformer):
-            def visit_Name(inner_self, node):
-                if node.id == old_var:
-                    self.successful = True
-                    outer_self.record_mutation(
+        for node, path in editor.walk():
+            if isinstance(node, ast.Name) and node.id == old_var:
+                if not self.successful:
+                    self.record_mutation(
                         mutator_type="VariableNameMutator",
                         mutate_type=mutate_type,
                         line_num=getattr(node, 'lineno', 0),
@@ -118,8 +130,5 @@ class VariableNameMutator(BaseMutator):
                         mutated_code=new_var,
                         description=f"Renamed '{old_var}' to '{new_var}'"
                     )
-                    return ast.copy_location(ast.Name(id=new_var, ctx=node.ctx), node)
-                return node
-
-        tree = VariableRenamer().visit(tree)
-        return ASTParser.tree_to_code(tree)
+                    self.successful = True
+                editor.touch(path).id = new_var
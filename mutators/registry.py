@@ -0,0 +1,87 @@
+import importlib
+from typing import Dict, List
+
+from config import CONFIG
+
+# Built-in mutators in the order of CONFIG.MUTATION_RATE; each lives in mutators/<name>.py.
+BUILTIN_MUTATORS = (
+    'BracketMutator',
+    'ColonMutator',
+    'FunctionMutator',
+    'IndentMutator',
+    'ModuleMutator',
+    'OperatorMutator',
+    'QuoteMutator',
+    'VariableNameMutator',
+    'ConditionMutator',
+    'BoundaryMutator',
+    'ArrayMutator',
+    'ArgMutator',
+    'ControlFlowMutator',
+    'EmptyStructureMutator',
+)
+
+# Installed packages add mutators by declaring entry points in this group, e.g.
+#     [project.entry-points."errorcorrector.mutators"]
+#     MyMutator = "my_package.mutators:MyMutator"
+ENTRY_POINT_GROUP = 'errorcorrector.mutators'
+
+_classes: Dict[str, type] = {}
+_plugins = None
+
+
+def _entry_points() -> dict:
+    """Plugin entry points by name, scanned once per process on first need."""
+    global _plugins
+    if _plugins is None:
+        from importlib import metadata  # only needed once a plugin is looked up
+        eps = metadata.entry_points()
+        group = eps.select(group=ENTRY_POINT_GROUP) if hasattr(eps, 'select') else eps.get(ENTRY_POINT_GROUP, ())
+        _plugins = {ep.name: ep for ep in group if ep.name not in BUILTIN_MUTATORS}
+    return _plugins
+
+
+def names() -> List[str]:
+    """Every registered mutator: the built-in ones in rate order, then plugins by name.
+
+    This (like get() for a name that is not built in) scans the entry points.
+    """
+    plugins = set(_entry_points()) | set(_classes)
+    return list(BUILTIN_MUTATORS) + sorted(plugins - set(BUILTIN_MUTATORS))
+
+
+def get(name: str) -> type:
+    """The mutator class registered as ``name``; its module is imported on first use."""
+    cls = _classes.get(name)
+    if cls is None:
+        if name in BUILTIN_MUTATORS:
+            cls = getattr(importlib.import_module(f'mutators.{name}'), name)
+        else:
+            entry_point = _entry_points().get(name)
+            if entry_point is None:
+                raise KeyError(f"Unknown mutator: {name}")
+            cls = entry_point.load()
+        _classes[name] = cls
+    return cls
+
+
+def register(cls: type, name: str = None) -> type:
+    """Register a mutator class in-process (usable as a decorator)."""
+    _classes[name or cls.__name__] = cls
+    return cls
+
+
+def rate(name: str) -> float:
+    """Sampling rate of a mutator: CONFIG.MUTATION_RATE for built-ins, CONFIG.PLUGIN_MUTATION_RATE for plugins."""
+    if name in BUILTIN_MUTATORS:
+        return CONFIG.MUTATION_RATE[BUILTIN_MUTATORS.index(name)]
+    return CONFIG.PLUGIN_MUTATION_RATE.get(name, CONFIG.PLUGIN_DEFAULT_RATE)
+
+
+def create(selected: List[str] = None) -> list:
+    """New instances of the named mutators, by default every registered one (see names).
+
+    The entry points are scanned only if a plugin can be among them: with
+    ``selected`` names that are all built in, never.
+    """
+    return [get(name)() for name in (names() if selected is None else selected)]
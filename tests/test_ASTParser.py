@@ -0,0 +1,28 @@
+import ast
+import unittest
+
+from ASTParser import AnalysisContext
+from mutators.ArgMutator import ArgMutator
+
+
+class TreeEditorFStringTest(unittest.TestCase):
+    # Spliced into the f-string, ast.unparse renders ',' with the f-string's own quote.
+    CODE = "x = f'({\",\".join([a for a in b])},)'\n"
+
+    def test_edit_inside_fstring_renders_valid_code(self):
+        context = AnalysisContext(self.CODE)
+        mutator = ArgMutator()
+        site, = [s for s in mutator.find_sites(context) if s.mutate_type == 'RemoveArg']
+        mutated = mutator.apply_site(context, site)
+        self.assertEqual(ast.dump(ast.parse(mutated)), ast.dump(ast.parse("x = f'({\",\".join()},)'\n")))
+
+    def test_edit_outside_fstring_is_spliced(self):
+        code = "y = f'{a!r}'  # kept\nprint(1, 2)\n"
+        context = AnalysisContext(code)
+        mutator = ArgMutator()
+        site = [s for s in mutator.find_sites(context) if s.mutate_type == 'RemoveArg'][0]
+        self.assertEqual(mutator.apply_site(context, site), "y = f'{a!r}'  # kept\nprint(2)\n")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import glob
+import os
+import random
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+import torch
+from tokenizers import ByteLevelBPETokenizer
+from torch.utils.data import DataLoader
+from transformers import RobertaTokenizerFast
+from tree_sitter import Parser
+
+from Corrector.Dataset import (CodeCorrectDataset, convert_example, graph_arrays, graph_attention_mask,
+                               subword_tokens, subword_tokens_fast)
+from Corrector.translation.parser import DFG_python
+from Corrector.translation.run import PY_LANGUAGE, extract_dataflow
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLES = sorted(glob.glob(os.path.join(ROOT, 'datasets', '*', '*', '*.py')))
+
+
+def train_tokenizer(directory):
+    """A small byte-level BPE tokenizer trained on the bundled samples, in RoBERTa form."""
+    bpe = ByteLevelBPETokenizer()
+    bpe.train(SAMPLES, vocab_size=2000, min_frequency=2,
+              special_tokens=['<s>', '<pad>', '</s>', '<unk>', '<mask>'], show_progress=False)
+    bpe.save_model(directory)
+    return RobertaTokenizerFast(os.path.join(directory, 'vocab.json'), os.path.join(directory, 'merges.txt'))
+
+
+def read_sample(path):
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+def reference_mask(feature):
+    """The graph-guided attention mask as the original per-item loop built it."""
+    length = len(feature.position_idx)
+    attn_mask = np.zeros((length, length), dtype=bool)
+    node_index = sum([i > 1 for i in feature.position_idx])
+    max_length = sum([i != 1 for i in feature.position_idx])
+    attn_mask[:node_index, :node_index] = True
+    for idx, i in enumerate(feature.source_ids):
+        if i in [0, 2]:
+            attn_mask[idx, :max_length] = True
+    for idx, (a, b) in enumerate(feature.dfg_to_code):
+        if a < node_index and b < node_index:
+            attn_mask[idx + node_index, a:b] = True
+            attn_mask[a:b, idx + node_index] = True
+    for idx, nodes in enumerate(feature.dfg_to_dfg):
+        for a in nodes:
+            if a + node_index < len(feature.position_idx):
+                attn_mask[idx + node_index, a + node_index] = True
+    np.fill_diagonal(attn_mask, True)
+    return attn_mask
+
+
+def random_feature(rng, length=64):
+    """A feature with random code, DFG and padding lengths, spans and edges, some out of range."""
+    tokens = rng.randint(1, length - 3)
+    nodes = rng.randint(0, length - tokens - 2)
+    padding = length - tokens - 2 - nodes
+    source_ids = [0] + [rng.randint(3, 50) for _ in range(tokens)] + [2] + [3] * nodes + [1] * padding
+    position_idx = list(range(2, tokens + 4)) + [0] * nodes + [1] * padding
+    spans = []
+    for _ in range(nodes):
+        start = rng.randint(0, length)
+        spans.append((start, start + rng.randint(0, 4)))
+    edges = [[rng.randint(0, nodes + 3) for _ in range(rng.randint(0, 3))] for _ in range(nodes)]
+    return SimpleNamespace(source_ids=source_ids, source_mask=[1] * (length - padding) + [0] * padding,
+                           position_idx=position_idx, target_ids=[0, 2] + [1] * 6, target_mask=[1, 1] + [0] * 6,
+                           dfg_to_code=spans, dfg_to_dfg=edges)
+
+
+class GraphAttentionMaskTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        rng = random.Random(0)
+        cls.features = [random_feature(rng) for _ in range(200)]
+        with tempfile.TemporaryDirectory() as directory:
+            tokenizer = train_tokenizer(directory)
+        parser = [Parser(PY_LANGUAGE), DFG_python]
+        for index, path in enumerate(SAMPLES[::10]):
+            code = read_sample(path)
+            example = {'buggy_code': code, 'fixed_code': code}
+            cls.features.append(convert_example(index + 5, example, tokenizer, parser, 'dev'))
+
+    def test_mask_matches_loop(self):
+        for feature in self.features:
+            mask = graph_attention_mask(*graph_arrays(feature), len(feature.position_idx))
+            self.assertTrue(np.array_equal(mask, reference_mask(feature)))
+
+    def test_dataset_item_matches_loop(self):
+        dataset = CodeCorrectDataset(self.features, batched_mask=False)
+        for item, feature in enumerate(self.features):
+            self.assertTrue(np.array_equal(dataset[item][3].numpy(), reference_mask(feature)))
+
+    def test_batched_collate_matches_loop(self):
+        for length in (64, 512):
+            features = [f for f in self.features if len(f.position_idx) == length]
+            dataset = CodeCorrectDataset(features, batched_mask=True)
+            loader = DataLoader(dataset, batch_size=7, collate_fn=dataset.collate_fn)
+            masks = torch.cat([batch[3] for batch in loader]).numpy()
+            self.assertEqual(len(masks), len(features))
+            for mask, feature in zip(masks, features):
+                self.assertTrue(np.array_equal(mask, reference_mask(feature)))
+
+
+class SubwordTokensFastTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with tempfile.TemporaryDirectory() as directory:
+            cls.tokenizer = train_tokenizer(directory)
+        cls.parser = [Parser(PY_LANGUAGE), DFG_python]
+
+    def test_matches_subword_tokens_on_samples(self):
+        compared = 0
+        for path in SAMPLES:
+            code_tokens, _ = extract_dataflow(read_sample(path), self.parser, "python")
+            fast = subword_tokens_fast(code_tokens, self.tokenizer)
+            if fast is None:
+                continue
+            with self.subTest(sample=os.path.relpath(path, ROOT)):
+                self.assertEqual(fast, subword_tokens(code_tokens, self.tokenizer))
+            compared += 1
+        self.assertGreater(compared, len(SAMPLES) // 2)
+
+
+if __name__ == '__main__':
+    unittest.main()